@@ -0,0 +1,92 @@
+"""Matching of asyncio streams and large payloads without blocking the event loop"""
+from __future__ import annotations
+
+import asyncio
+from collections.abc import AsyncIterable, AsyncIterator
+from concurrent.futures import Executor
+
+from regex import DEFAULT_STREAM_CHUNK_SIZE, Matcher, RegexFSM
+
+# characters or bytes consumed between two yields to the event loop
+DEFAULT_YIELD_SIZE = 64 * 1024
+# payloads at least this long are matched in the executor when one is given
+DEFAULT_OFFLOAD_SIZE = 1024 * 1024
+
+
+async def iter_stream_chunks(source: AsyncIterable[str | bytes] | asyncio.StreamReader,
+                             chunk_size: int = DEFAULT_STREAM_CHUNK_SIZE) -> AsyncIterator[str | bytes]:
+    """
+    function yields chunks of async iterable or of stream reader read by chunk_size bytes
+    """
+    if isinstance(source, asyncio.StreamReader):
+        while chunk := await source.read(chunk_size):
+            yield chunk
+        return
+
+    async for chunk in source:
+        yield chunk
+
+
+async def _advance(matcher: Matcher, chunk: str | bytes | bytearray, yield_size: int) -> None:
+    """
+    function consumes chunk in slices of yield_size, giving control to the event loop after every slice
+    """
+    advance = matcher.advance if isinstance(chunk, str) else matcher.advance_bytes
+    for start in range(0, len(chunk), yield_size):
+        if advance(chunk[start:start+yield_size]).is_dead():
+            return
+        await asyncio.sleep(0)
+
+
+async def match_stream_async(fsm: RegexFSM, source: AsyncIterable[str | bytes] | asyncio.StreamReader,
+                             chunk_size: int = DEFAULT_STREAM_CHUNK_SIZE,
+                             yield_size: int = DEFAULT_YIELD_SIZE) -> bool:
+    """
+    Checks whether input read from an async source is accepted by FSM.
+
+    Args:
+        fsm: The compiled RegexFSM object
+        source: Async iterable of str or bytes chunks, or asyncio.StreamReader
+        chunk_size: Number of bytes read from stream reader at once
+        yield_size: Characters or bytes consumed between yields to the event loop
+
+    Returns:
+        True if whole input is accepted; reading stops as soon as no state is alive
+    """
+    matcher = fsm.matcher()
+    async for chunk in iter_stream_chunks(source, chunk_size):
+        await _advance(matcher, chunk, yield_size)
+        if matcher.is_dead():
+            break
+    return matcher.finish()
+
+
+async def check_async(fsm: RegexFSM, data: str | bytes | bytearray, executor: Executor | None = None,
+                      yield_size: int = DEFAULT_YIELD_SIZE, offload_size: int = DEFAULT_OFFLOAD_SIZE) -> bool:
+    """
+    Checks whether string or binary data is accepted by FSM without blocking the event loop.
+
+    Args:
+        fsm: The compiled RegexFSM object, shared with executor threads
+        data: String, or bytes where every byte is one character
+        executor: Executor for payloads of at least offload_size, None matches in the loop
+        yield_size: Characters or bytes consumed between yields to the event loop
+        offload_size: Length from which data is matched in the executor
+
+    Returns:
+        True if data is accepted
+    """
+    check = fsm.check_string if isinstance(data, str) else fsm.check_bytes
+    if len(data) <= yield_size:
+        return check(data)
+
+    if executor is not None and len(data) >= offload_size:
+        return await asyncio.get_running_loop().run_in_executor(executor, check, data)
+
+    if fsm.has_literals and not fsm.prefilter(data):
+        # rejected by literals without running the automaton
+        return check(data)
+
+    matcher = fsm.matcher()
+    await _advance(matcher, data, yield_size)
+    return matcher.finish()
@@ -0,0 +1,288 @@
+"""Benchmarks of pattern compilation, matching throughput and memory of RegexFSM"""
+from __future__ import annotations
+
+import argparse
+import json
+import platform
+import random
+import re
+import sys
+import time
+import tracemalloc
+from collections.abc import Callable, Sequence
+from typing import NamedTuple
+
+from regex import RegexFSM, purge
+
+RESULTS_VERSION = 1
+DEFAULT_SIZES = (1000, 100000)
+DEFAULT_REPEAT = 3
+DEFAULT_THRESHOLD = 0.2
+DEFAULT_SEED = 2024
+
+LETTERS = "abcdefghijklmnopqrstuvwxyz"
+PRINTABLE = "".join(chr(code) for code in range(32, 127))
+LITERAL = "the quick brown fox jumps over the lazy dog"
+CYRILLIC = "абвгдеёжзийклмнопрстуфхцчшщъыьэюя"
+CJK = "".join(chr(code) for code in range(0x4e00, 0x4e00 + 64))
+
+
+class BenchmarkCase(NamedTuple):
+    """
+    pattern of the corpus with generator of matching input of given size
+    """
+    name: str
+    pattern: str
+    make_input: Callable[[random.Random, int], str]
+
+
+def _random_text(rng: random.Random, alphabet: str, size: int) -> str:
+    """
+    function returns random string of given size from characters of alphabet
+    """
+    return "".join(rng.choices(alphabet, k=size))
+
+
+def _words(rng: random.Random, size: int) -> str:
+    """
+    function returns lowercase words of 1-8 letters separated by single spaces
+    """
+    words = []
+    length = -1
+    while length < size:
+        word = _random_text(rng, LETTERS, rng.randint(1, 8))
+        words.append(word)
+        length += len(word) + 1
+    return " ".join(words)
+
+
+def _records(rng: random.Random, size: int) -> str:
+    """
+    function returns comma terminated keywords with numbers followed by "end"
+    """
+    records = []
+    length = 3
+    while length < size:
+        record = rng.choice(("foo", "bar", "baz", "qux")) + str(rng.randrange(10**6)) + ","
+        records.append(record)
+        length += len(record)
+    return "".join(records) + "end"
+
+
+CORPUS: tuple[BenchmarkCase, ...] = (
+    BenchmarkCase("nested_dot_star", ".*a.*b.*c.*d",
+                  lambda rng, size: _random_text(rng, "abcxyz", max(size-1, 0)) + "d"),
+    BenchmarkCase("wide_class", "[ -~]+",
+                  lambda rng, size: _random_text(rng, PRINTABLE, max(size, 1))),
+    BenchmarkCase("long_literal", ".*" + LITERAL,
+                  lambda rng, size: _random_text(rng, LETTERS + " ", max(size-len(LITERAL), 0)) + LITERAL),
+    BenchmarkCase("counted_words", "([a-z]{1,8} )*[a-z]{1,8}", _words),
+    BenchmarkCase("alternation", "((foo|bar|baz|qux)[0-9]+,)*end", _records),
+    BenchmarkCase("multilingual", "[ а-яё]*[\u4e00-\u9fff]+",
+                  lambda rng, size: _random_text(rng, CYRILLIC + " ", size // 2)
+                  + _random_text(rng, CJK, max(size - size // 2, 1))),
+)
+
+
+def _new_matcher(engine: str, pattern: str) -> Callable[[str], bool]:
+    """
+    function compiles pattern for engine and returns function checking whole strings
+    """
+    match engine:
+        case "re":
+            compiled = re.compile(pattern)
+            return lambda string: compiled.fullmatch(string) is not None
+        case "nfa":
+            return RegexFSM(pattern, dfa_cache_size=0).check_string
+        case "lazy":
+            return RegexFSM(pattern).check_string
+        case "dense":
+            return RegexFSM(pattern, minimize=True).check_string
+    raise ValueError(f"Unknown engine '{engine}'")
+
+
+ENGINES = ("re", "nfa", "lazy", "dense")
+
+
+def _best_time(function: Callable[[], object], repeat: int) -> float:
+    """
+    function returns the shortest of repeat wall clock timings of function call
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _compile_seconds(engine: str, pattern: str, repeat: int) -> float:
+    """
+    function measures time of compiling pattern without any cache,
+    parsed patterns are dropped as well as compiled ones
+    """
+    def compile_pattern() -> None:
+        re.purge()
+        purge()
+        _new_matcher(engine, pattern)
+    return _best_time(compile_pattern, repeat)
+
+
+def _peak_memory(engine: str, pattern: str, string: str) -> int:
+    """
+    function measures peak of memory allocated by compiling pattern and matching one string
+    """
+    re.purge()
+    purge()
+    tracemalloc.start()
+    try:
+        check = _new_matcher(engine, pattern)
+        check(string)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run_case(case: BenchmarkCase, engine: str, sizes: Sequence[int] = DEFAULT_SIZES,
+             repeat: int = DEFAULT_REPEAT, seed: int = DEFAULT_SEED) -> dict:
+    """
+    Benchmarks one pattern of the corpus with one engine.
+
+    Args:
+        case: Pattern of the corpus with its input generator
+        engine: One of ENGINES ("re" is the baseline)
+        sizes: Lengths of matched inputs in characters
+        repeat: Number of timings, the best one is reported
+        seed: Seed of the input generator
+
+    Returns:
+        JSON serializable dictionary with compile time, peak memory and throughput per size
+    """
+    rng = random.Random(seed)
+    inputs = [case.make_input(rng, size) for size in sizes]
+
+    check = _new_matcher(engine, case.pattern)
+    throughput = {}
+    for size, string in zip(sizes, inputs):
+        # lazy DFA is warmed up by the first run, timings measure steady state
+        if not check(string):
+            raise AssertionError(f"Input of case '{case.name}' does not match")
+        seconds = _best_time(lambda: check(string), repeat)
+        throughput[str(size)] = len(string) / 1e6 / seconds if seconds else float("inf")
+
+    return {
+        "case": case.name,
+        "pattern": case.pattern,
+        "engine": engine,
+        "compile_seconds": _compile_seconds(engine, case.pattern, repeat),
+        "peak_memory_bytes": _peak_memory(engine, case.pattern, inputs[0]),
+        "throughput_mb_s": throughput,
+    }
+
+
+def run_benchmarks(cases: Sequence[BenchmarkCase] = CORPUS, engines: Sequence[str] = ENGINES,
+                   sizes: Sequence[int] = DEFAULT_SIZES, repeat: int = DEFAULT_REPEAT,
+                   seed: int = DEFAULT_SEED) -> dict:
+    """
+    Benchmarks every pattern of the corpus with every engine.
+
+    Args:
+        cases: Patterns with their input generators
+        engines: Engines to compare
+        sizes: Lengths of matched inputs in characters
+        repeat: Number of timings, the best one is reported
+        seed: Seed of the input generator
+
+    Returns:
+        JSON serializable dictionary with environment description and list of results
+    """
+    return {
+        "version": RESULTS_VERSION,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "sizes": list(sizes),
+        "results": [run_case(case, engine, sizes, repeat, seed) for case in cases for engine in engines],
+    }
+
+
+def compare_results(baseline: dict, current: dict, threshold: float = DEFAULT_THRESHOLD) -> list[str]:
+    """
+    Finds regressions between two benchmark runs.
+
+    Args:
+        baseline: Results of the previous version
+        current: Results of the current version
+        threshold: Allowed relative slowdown, 0.2 is 20%
+
+    Returns:
+        Descriptions of throughput drops and compile time growths above threshold
+    """
+    baseline_results = {(result["case"], result["engine"]): result for result in baseline["results"]}
+
+    regressions = []
+    for result in current["results"]:
+        old = baseline_results.get((result["case"], result["engine"]))
+        if old is None:
+            continue
+        name = f"{result['case']}/{result['engine']}"
+
+        for size, speed in result["throughput_mb_s"].items():
+            old_speed = old["throughput_mb_s"].get(size)
+            if old_speed and speed < old_speed * (1 - threshold):
+                regressions.append(f"{name} size {size}: {old_speed:.2f} -> {speed:.2f} MB/s")
+
+        if result["compile_seconds"] > old["compile_seconds"] * (1 + threshold):
+            regressions.append(f"{name} compile: {old['compile_seconds'] * 1e3:.3f} -> "
+                               f"{result['compile_seconds'] * 1e3:.3f} ms")
+    return regressions
+
+
+def format_results(results: dict) -> str:
+    """
+    function returns table of results readable in terminal
+    """
+    sizes = [str(size) for size in results["sizes"]]
+    lines = [f"{'case':<16} {'engine':<6} {'compile ms':>10} {'memory KiB':>10} "
+             + " ".join(f"{'MB/s@' + size:>12}" for size in sizes)]
+    for result in results["results"]:
+        speeds = " ".join(f"{result['throughput_mb_s'].get(size, 0):>12.2f}" for size in sizes)
+        lines.append(f"{result['case']:<16} {result['engine']:<6} {result['compile_seconds'] * 1e3:>10.3f} "
+                     f"{result['peak_memory_bytes'] / 1024:>10.1f} {speeds}")
+    return "\n".join(lines)
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    """
+    command line entry point, returns exit status (1 if regressions were found)
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("-o", "--output", help="write results as JSON to this file")
+    parser.add_argument("--compare", metavar="BASELINE", help="JSON results of previous version to compare with")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="allowed relative slowdown when comparing (default %(default)s)")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="input sizes in characters")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="timings per measurement")
+    parser.add_argument("--engines", nargs="+", choices=ENGINES, default=ENGINES)
+    parser.add_argument("--cases", nargs="+", choices=[case.name for case in CORPUS],
+                        default=[case.name for case in CORPUS])
+    args = parser.parse_args(argv)
+
+    cases = [case for case in CORPUS if case.name in args.cases]
+    results = run_benchmarks(cases, args.engines, args.sizes, args.repeat)
+    print(format_results(results))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as file:
+            regressions = compare_results(json.load(file), results, args.threshold)
+        for regression in regressions:
+            print("regression:", regression)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,136 @@
+"""Parallel matching of large line-oriented inputs with a process pool"""
+from __future__ import annotations
+
+from collections import deque
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from itertools import islice
+import os
+
+from regex import RegexFSM
+
+DEFAULT_CHUNK_LINES = 10000
+
+# FSM of the worker process, set once by the pool initializer
+_worker_fsm: RegexFSM | None = None
+
+
+def _init_worker(fsm: RegexFSM) -> None:
+    """
+    function stores FSM unpickled once per worker process
+    """
+    global _worker_fsm
+    _worker_fsm = fsm
+
+
+def _match_lines(lines: list[str]) -> list[bool]:
+    """
+    function checks chunk of lines in worker process
+    """
+    check_string = _worker_fsm.check_string
+    return [check_string(line) for line in lines]
+
+
+def _match_file(path: str | os.PathLike, encoding: str) -> list[int]:
+    """
+    function returns numbers of matching lines of file read in worker process
+    """
+    check_string = _worker_fsm.check_string
+    with open(path, encoding=encoding, newline="") as file:
+        return [number for number, line in enumerate(file, 1) if check_string(line.rstrip("\r\n"))]
+
+
+def iter_line_chunks(lines: Iterable[str], chunk_lines: int = DEFAULT_CHUNK_LINES) -> Iterator[list[str]]:
+    """
+    function splits lines into lists of at most chunk_lines lines
+    """
+    lines = iter(lines)
+    while chunk := list(islice(lines, chunk_lines)):
+        yield chunk
+
+
+def _ordered_map(executor: Executor, function: Callable, tasks: Iterable, window: int) -> Iterator:
+    """
+    function yields results of tasks in order of the tasks,
+    keeping at most window tasks submitted at once so input is read lazily
+    """
+    futures: deque[Future] = deque()
+    for task in tasks:
+        futures.append(executor.submit(function, *task))
+        if len(futures) >= window:
+            yield futures.popleft().result()
+
+    while futures:
+        yield futures.popleft().result()
+
+
+def _new_executor(fsm: RegexFSM, max_workers: int | None) -> ProcessPoolExecutor:
+    """
+    function creates process pool which receives FSM once per worker
+    """
+    return ProcessPoolExecutor(max_workers, initializer=_init_worker, initargs=(fsm,))
+
+
+def match_lines(fsm: RegexFSM, lines: Iterable[str], max_workers: int | None = None,
+                chunk_lines: int = DEFAULT_CHUNK_LINES) -> list[bool]:
+    """
+    Checks every line in worker processes.
+
+    Args:
+        fsm: The compiled RegexFSM object
+        lines: Lines without line endings, read lazily chunk by chunk
+        max_workers: Number of worker processes (number of CPUs by default)
+        chunk_lines: Number of lines sent to a worker in one task
+
+    Returns:
+        List with result for every line, in order of the lines
+    """
+    with _new_executor(fsm, max_workers) as executor:
+        window = 2 * (max_workers or os.cpu_count() or 1)
+        tasks = ((chunk,) for chunk in iter_line_chunks(lines, chunk_lines))
+
+        results = []
+        for chunk_results in _ordered_map(executor, _match_lines, tasks, window):
+            results.extend(chunk_results)
+        return results
+
+
+def match_file(fsm: RegexFSM, path: str | os.PathLike, max_workers: int | None = None,
+               chunk_lines: int = DEFAULT_CHUNK_LINES, encoding: str = "utf-8") -> list[int]:
+    """
+    Finds lines of one large file accepted by FSM, chunks of lines are checked in worker processes.
+
+    Args:
+        fsm: The compiled RegexFSM object
+        path: Path to the text file
+        max_workers: Number of worker processes (number of CPUs by default)
+        chunk_lines: Number of lines sent to a worker in one task
+        encoding: Encoding of the file
+
+    Returns:
+        Sorted numbers of matching lines, starting from 1
+    """
+    with open(path, encoding=encoding, newline="") as file:
+        lines = (line.rstrip("\r\n") for line in file)
+        results = match_lines(fsm, lines, max_workers, chunk_lines)
+    return [number for number, is_matched in enumerate(results, 1) if is_matched]
+
+
+def match_files(fsm: RegexFSM, paths: Iterable[str | os.PathLike], max_workers: int | None = None,
+                encoding: str = "utf-8") -> list[list[int]]:
+    """
+    Finds matching lines in many files, every file is read and checked by one worker process.
+
+    Args:
+        fsm: The compiled RegexFSM object
+        paths: Paths to the text files
+        max_workers: Number of worker processes (number of CPUs by default)
+        encoding: Encoding of the files
+
+    Returns:
+        For every file, in order of the paths, sorted numbers of matching lines starting from 1
+    """
+    with _new_executor(fsm, max_workers) as executor:
+        window = 2 * (max_workers or os.cpu_count() or 1)
+        tasks = ((path, encoding) for path in paths)
+        return list(_ordered_map(executor, _match_file, tasks, window))
@@ -1,11 +1,168 @@
 """regex.py"""
 from __future__ import annotations
 
+import hashlib
+from bisect import bisect_right
+import os
+import struct
+import sys
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from collections.abc import Callable, Iterable, Iterator, Sequence
+from functools import lru_cache
+from itertools import count
+from operator import length_hint
+from mmap import ACCESS_READ, mmap
+from typing import NamedTuple, TextIO
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class CharSet:
+    """
+    Immutable set of characters stored as sorted list of disjoint code point ranges,
+    codes below 256 are also kept in a bitmap so membership of ascii, latin-1 and bytes is a bit test,
+    higher codes are found by bisection of range starts
+    """
+    __slots__ = ("ranges", "bitmap", "__starts")
+
+    BITMAP_SIZE = 256
+
+    def __init__(self, ranges: Iterable[tuple[int, int]] = ()) -> None:
+        """
+        constructor for set of characters from inclusive (first, last) code point ranges,
+        ranges may overlap and come in any order
+        """
+        merged: list[tuple[int, int]] = []
+        for first, last in sorted(ranges):
+            if first > last:
+                continue
+            if merged and first <= merged[-1][1] + 1:
+                if last > merged[-1][1]:
+                    merged[-1] = (merged[-1][0], last)
+            else:
+                merged.append((first, last))
+
+        self.ranges: tuple[tuple[int, int], ...] = tuple(merged)
+        self.__starts = [first for first, _ in merged]
+
+        bitmap = 0
+        for first, last in merged:
+            if first >= self.BITMAP_SIZE:
+                break
+            last = min(last, self.BITMAP_SIZE-1)
+            bitmap |= (1 << (last+1)) - (1 << first)
+        self.bitmap: int = bitmap
+
+    @classmethod
+    def of(cls, chars: Iterable[str]) -> CharSet:
+        """
+        function creates set of given characters
+        """
+        return cls((ord(char), ord(char)) for char in chars)
+
+    def __contains__(self, char: str) -> bool:
+        """
+        function checks whether character is in the set
+        """
+        return self.contains_code(ord(char))
+
+    def contains_code(self, code: int) -> bool:
+        """
+        function checks whether character with given code point is in the set
+        """
+        if code < self.BITMAP_SIZE:
+            return bool(self.bitmap >> code & 1)
+        i = bisect_right(self.__starts, code) - 1
+        return i >= 0 and code <= self.ranges[i][1]
+
+    def codes(self) -> Iterator[int]:
+        """
+        function yields code points of the set in increasing order
+        """
+        for first, last in self.ranges:
+            yield from range(first, last+1)
+
+    def __iter__(self) -> Iterator[str]:
+        return map(chr, self.codes())
+
+    def __len__(self) -> int:
+        return sum(last - first + 1 for first, last in self.ranges)
+
+    def __bool__(self) -> bool:
+        return bool(self.ranges)
+
+    def __or__(self, other: CharSet) -> CharSet:
+        """
+        function returns union of sets
+        """
+        return CharSet(self.ranges + other.ranges)
+
+    def __and__(self, other: CharSet) -> CharSet:
+        """
+        function returns intersection of sets by merging both range lists
+        """
+        ranges = []
+        i = j = 0
+        while i < len(self.ranges) and j < len(other.ranges):
+            first = max(self.ranges[i][0], other.ranges[j][0])
+            last = min(self.ranges[i][1], other.ranges[j][1])
+            if first <= last:
+                ranges.append((first, last))
+            if self.ranges[i][1] < other.ranges[j][1]:
+                i += 1
+            else:
+                j += 1
+        return CharSet(ranges)
+
+    def __sub__(self, other: CharSet) -> CharSet:
+        """
+        function returns characters of the set which are not in other set
+        """
+        ranges = []
+        for first, last in self.ranges:
+            for other_first, other_last in other.ranges:
+                if other_last < first or other_first > last:
+                    continue
+                if other_first > first:
+                    ranges.append((first, other_first-1))
+                first = other_last+1
+            if first <= last:
+                ranges.append((first, last))
+        return CharSet(ranges)
+
+    def __le__(self, other: CharSet) -> bool:
+        """
+        function checks whether the set is subset of other set
+        """
+        return not self - other
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, CharSet) and self.ranges == other.ranges
+
+    def __hash__(self) -> int:
+        return hash(self.ranges)
+
+    def __repr__(self) -> str:
+        return f"CharSet({list(self.ranges)!r})"
+
+
+EMPTY_CHARS = CharSet()
+ASCII_CHARS = CharSet([(0, 127)])
+UNICODE_CHARS = CharSet([(0, sys.maxunicode)])
+
 
 class State:
     """
     Basic class for state in FSM
     """
+    __slots__ = ("__id", "next_states", "epsilon_transition_states", "is_accept_state")
+
     def __init__(self, state_id: int) -> None:
         """
         constructor for state
@@ -15,6 +172,13 @@ class State:
         self.epsilon_transition_states: set[State] = set()
         self.is_accept_state: bool = False
 
+    @property
+    def state_id(self) -> int:
+        """
+        id of the state, unique inside one FSM
+        """
+        return self.__id
+
     def add_loop(self) -> None:
         """
         function adds loop to current state
@@ -28,9 +192,19 @@ class State:
         if isinstance(self, AsciiState):
             return self.char == char
         if isinstance(self, DotState):
-            return char.isascii()
+            return True
         return False
 
+    def accepted_chars(self) -> CharSet:
+        """
+        function returns set of all characters handled by the current state
+        """
+        if isinstance(self, AsciiState):
+            return CharSet.of(self.char)
+        if isinstance(self, DotState):
+            return UNICODE_CHARS
+        return EMPTY_CHARS
+
     def add_next_state(self, state: State, epsilon_transition: bool=False) -> None:
         """
         function adds next state to current state
@@ -50,16 +224,29 @@ class State:
                 nxt_states.add(next_state)
         return nxt_states
 
-    def epsilon_closure(self) -> set[State]:
+    def epsilon_closure(self, closure: set[State] | None = None) -> set[State]:
         """
         function returns set of states reachable from current state by epsilon transitions
         """
-        closure = set()
+        if closure is None:
+            closure = set()
         closure.add(self)
-        for state in self.epsilon_transition_states:
-            closure.update(state.epsilon_closure())
+        worklist = [self]
+        while worklist:
+            for state in worklist.pop().epsilon_transition_states:
+                if state not in closure:
+                    closure.add(state)
+                    worklist.append(state)
         return closure
 
+    def __eq__(self, other: object) -> bool:
+        """
+        states are equal when they have the same id, ids are unique inside one FSM
+        """
+        if not isinstance(other, State):
+            return NotImplemented
+        return self.__id == other.__id
+
     def __hash__(self):
         return hash(self.__id)
 
@@ -67,18 +254,29 @@ class StartState(State):
     """
     state for start state
     """
+    __slots__ = ()
 
 
 class DotState(State):
     """
     state for "." character (any character accepted)
     """
+    __slots__ = ()
+
+
+class EpsilonState(State):
+    """
+    state joining branches of alternation or repetition, it consumes no character
+    """
+    __slots__ = ()
 
 
 class AsciiState(State):
     """
-    state for alphabet letters or numbers
+    state for one literal character, any code point despite the name
     """
+    __slots__ = ("char",)
+
     def __init__(self, state_id: int, char: str) -> None:
         super().__init__(state_id)
         self.char: str = char
@@ -88,141 +286,2495 @@ class CharClassState(State):
     """
     State for character class [abc], [a-z], etc.
     """
-    def __init__(self, state_id: int, chars: set, is_negated: bool):
+    __slots__ = ("chars", "is_negated", "accepted")
+
+    def __init__(self, state_id: int, chars: CharSet, is_negated: bool):
         super().__init__(state_id)
-        self.chars: set = chars
+        self.chars: CharSet = chars
         self.is_negated: bool = is_negated
+        # negated class is kept as ranges of all other code points
+        self.accepted: CharSet = UNICODE_CHARS - chars if is_negated else chars
 
     def accepts(self, char):
         """
         function checks whether occured character is handled by the current state
         """
-        if self.is_negated:
-            return char.isascii() and char not in self.chars
+        return char in self.accepted
 
-        return char in self.chars
+    def accepted_chars(self) -> CharSet:
+        return self.accepted
 
 
-class RegexFSM:
+DEFAULT_DFA_CACHE_SIZE = 1024
+DEFAULT_PATTERN_CACHE_SIZE = 512
+DEFAULT_PATTERN_CACHE_DFA_STATES = 65536
+DEFAULT_STREAM_CHUNK_SIZE = 65536
+DEAD_STATE = 0
+UNKNOWN_STATE = -1
+UNKNOWN_BYTE_ROW = [UNKNOWN_STATE] * 256
+
+# bounds of repetition operators, None is unbounded
+REPEAT_BOUNDS = {"*": (0, None), "+": (1, None), "?": (0, 1)}
+ATOM_NODES = ("char", "dot", "class")
+# escapes of control characters, other escaped letters and digits are refused
+CONTROL_ESCAPES = {"n": "\n", "t": "\t", "r": "\r", "f": "\f", "v": "\v"}
+
+MAX_LITERAL_LENGTH = 256
+# parsed patterns kept by parse() and distinct nodes shared by all parsed patterns
+MAX_PARSED_PATTERNS = 4096
+MAX_INTERNED_NODES = 65536
+# height of parse tree (groups and stacked repetitions), deeper patterns are refused
+# before the recursive parser and builders could exhaust the interpreter stack
+MAX_NESTING_DEPTH = 100
+# linear patterns up to this number of states are simulated by Shift-And
+MAX_SHIFT_AND_STATES = 64
+
+# classes of at most this many code points above 255 are memoized by minimized DFA
+MAX_MEMOIZED_CODES = 65536
+# estimated memory of one lazy DFA state (256-entry byte row, transition dict and index entry)
+# without its bitmask of NFA states
+DFA_STATE_BYTES = 2560
+# estimated memory of one lazy DFA transition by character, characters above 255
+# are new objects kept alive as keys, lower ones are shared by the interpreter
+DFA_TRANSITION_BYTES = 48
+DFA_CHAR_KEY_BYTES = 80
+
+DFA_FILE_MAGIC = b"RFSM"
+DFA_FILE_VERSION = 2
+# magic, version, flags, number of classes, number of code ranges, number of states, start state, pattern digest
+DFA_FILE_HEADER = struct.Struct("<4sHHIIII32s")
+DFA_FILE_HAS_SINK = 1
+
+
+class Token(NamedTuple):
     """
-    Finite State Machine for regex
+    token of pattern: kind is "char", "dot", "class", "repeat", "(", ")" or "|",
+    value is the character, (chars, is_negated) of class or (min, max) of repetition,
+    position is index of the token in pattern
     """
-    def __init__(self, regex_expr: str) -> None:
-        self.start_state = StartState(0)
-        self.__init_machine(regex_expr)
+    kind: str
+    value: object
+    position: int
 
-        self.__start_states: set[State] = self.start_state.epsilon_closure()
-        self.__cur_states: set[State] = self.__start_states
 
-    def __parse_char_class(self, regex_expr: str, i: int) -> tuple[set, bool, int]:
-        """
-        function parses character class
-        """
-        char_set = set()
-        is_negated = False
+def _escaped_char(pattern: str, i: int) -> str:
+    """
+    function returns character escaped by backslash at i, special characters stand
+    for themselves, letters and digits other than control escapes raise error
+    """
+    if i+1 == len(pattern):
+        raise AttributeError("Pattern ends with '\\'")
+    char = pattern[i+1]
+    if char in CONTROL_ESCAPES:
+        return CONTROL_ESCAPES[char]
+    if char.isascii() and char.isalnum():
+        raise AttributeError(f"Unsupported escape '\\{char}' at position {i}")
+    return char
 
-        if regex_expr[i] == "^":
-            is_negated = True
-            i += 1
 
-        while i < len(regex_expr) and regex_expr[i] != "]":
+def _tokenize_char_class(pattern: str, i: int) -> tuple[CharSet, bool, int]:
+    """
+    function reads character class after "[" into set of code point ranges,
+    returns index of closing "]"
+    """
+    ranges = []
+    is_negated = False
 
-            if i+2 < len(regex_expr) and regex_expr[i+1] == "-":
-                start_char = regex_expr[i]
-                end_char = regex_expr[i+2]
-                char_set.update(chr(c) for c in range(ord(start_char), ord(end_char)+1))
-                i += 3
-                continue
+    if i < len(pattern) and pattern[i] == "^":
+        is_negated = True
+        i += 1
 
-            char_set.add(regex_expr[i])
+    while i < len(pattern) and pattern[i] != "]":
+        if pattern[i] == "\\" and i+1 < len(pattern):
+            code = ord(_escaped_char(pattern, i))
+            ranges.append((code, code))
+            i += 2
+        elif i+2 < len(pattern) and pattern[i+1] == "-":
+            ranges.append((ord(pattern[i]), ord(pattern[i+2])))
+            i += 3
+        else:
+            ranges.append((ord(pattern[i]), ord(pattern[i])))
             i += 1
 
-        return char_set, is_negated, i
+    return CharSet(ranges), is_negated, i
 
-    def __init_machine(self, regex_expr: str) -> None:
-        """
-        function initializes FSM
-        """
-        prev_state = self.start_state
 
-        i, state_id = 0, 1
-        while i < len(regex_expr):
-            char = regex_expr[i]
+def _tokenize_count(pattern: str, i: int) -> tuple[int, int | None, int] | None:
+    """
+    function reads {m}, {m,}, {,n} or {m,n} starting at i, None is returned
+    if braces do not hold a count and are matched literally
+    """
+    end = pattern.find("}", i)
+    if end < 0:
+        return None
 
-            if char in ("*", "+"):
-                i += 1
-                continue
+    bounds = pattern[i+1:end].split(",")
+    if len(bounds) > 2 or not any(bounds):
+        return None
+    if not all(bound == "" or (bound.isascii() and bound.isdecimal()) for bound in bounds):
+        return None
+
+    min_count = int(bounds[0] or 0)
+    max_count = min_count if len(bounds) == 1 else int(bounds[1]) if bounds[1] else None
+    if max_count is not None and max_count < min_count:
+        raise AttributeError(f"Bad repetition bounds at position {i}")
+    return min_count, max_count, end
+
+
+def tokenize(pattern: str) -> list[Token]:
+    """
+    function splits pattern into tokens in one pass, escapes, character classes
+    and counted repetitions are resolved here, so parser never looks at characters.
+    Height of the parse tree is tracked as well, patterns nested deeper than
+    MAX_NESTING_DEPTH are refused
+    """
+    tokens = []
+    # heights of finished items of enclosing groups, of finished items of current group
+    # and of the last item with its repetitions
+    outer_heights: list[int] = []
+    group_height = item_height = 0
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        start = i
 
+        if char == "|":
+            group_height = max(group_height, item_height)
+            item_height = 0
+            tokens.append(Token(char, None, start))
+        elif char == ")":
+            inner_height = max(group_height, item_height) + 1
+            group_height = outer_heights.pop() if outer_heights else 0
+            item_height = inner_height
+            tokens.append(Token(char, None, start))
+        elif char == "(":
+            if pattern.startswith("?:", i+1):
+                i += 2
+            outer_heights.append(max(group_height, item_height))
+            group_height = item_height = 0
+            if len(outer_heights) > MAX_NESTING_DEPTH:
+                raise AttributeError(f"Groups nested deeper than {MAX_NESTING_DEPTH} levels at position {start}")
+            tokens.append(Token("(", None, start))
+        elif char in REPEAT_BOUNDS:
+            item_height += 1
+            tokens.append(Token("repeat", REPEAT_BOUNDS[char], start))
+        elif char == "{" and (count_bounds := _tokenize_count(pattern, i)) is not None:
+            min_count, max_count, i = count_bounds
+            item_height += 1
+            tokens.append(Token("repeat", (min_count, max_count), start))
+        else:
+            group_height = max(group_height, item_height)
+            item_height = 1
             if char == ".":
-                cur_state = DotState(state_id)
-                state_id += 1
+                tokens.append(Token("dot", None, start))
             elif char == "[":
-                char_set, is_negated, i = self.__parse_char_class(regex_expr, i+1)
-                cur_state = CharClassState(state_id, char_set, is_negated)
-                state_id += 1
-            elif char.isascii():
-                cur_state = AsciiState(state_id, char)
-                state_id += 1
+                char_set, is_negated, i = _tokenize_char_class(pattern, i+1)
+                if i == len(pattern):
+                    raise AttributeError("Missing ']'")
+                tokens.append(Token("class", (char_set, is_negated), start))
             else:
-                raise AttributeError(f"Character '{char}'' is not supported")
-
-            next_char = regex_expr[i+1] if i+1 < len(regex_expr) else None
-
-            match next_char:
-                case "*":
-                    cur_state.add_loop()
-                    if prev_state is not None:
-                        prev_state.epsilon_transition_states.add(cur_state)
-                case "+":
-                    cur_state.add_loop()
-                    if prev_state is not None:
-                        prev_state.next_states.add(cur_state)
-                case _:
-                    if prev_state is not None:
-                        prev_state.next_states.add(cur_state)
-
-            if i == len(regex_expr)-1 or (i == len(regex_expr)-2 and next_char in ("+", "*")):
-                cur_state.is_accept_state = True
-
-            prev_state = cur_state
-            i += 1
+                if char == "\\":
+                    char = _escaped_char(pattern, i)
+                    i += 1
+                tokens.append(Token("char", char, start))
+
+        if item_height > MAX_NESTING_DEPTH:
+            raise AttributeError(f"Pattern nested deeper than {MAX_NESTING_DEPTH} levels at position {start}")
+        i += 1
+    return tokens
+
+
+_interned_nodes: dict[tuple, tuple] = {}
+
+
+def intern_node(node: tuple) -> tuple:
+    """
+    function returns the shared node structurally equal to given one, children of
+    nodes are interned first, so comparing a node compares identical children only
+    """
+    if len(_interned_nodes) >= MAX_INTERNED_NODES:
+        _interned_nodes.clear()
+    return _interned_nodes.setdefault(node, node)
+
+
+@lru_cache(maxsize=MAX_PARSED_PATTERNS)
+def parse(pattern: str) -> tuple:
+    """
+    function parses pattern into tree of hashable tuple nodes shared by all parsed patterns:
+    ("char", c), ("dot",), ("class", chars, is_negated), ("concat", items),
+    ("alt", branches) and ("repeat", node, min, max) where max None is unbounded
+    """
+    tokens = tokenize(pattern)
+    node, i = _parse_alternation(tokens, 0)
+    if i < len(tokens):
+        raise AttributeError(f"Unbalanced ')' at position {tokens[i].position}")
+    return node
+
+
+def _parse_alternation(tokens: list[Token], i: int) -> tuple[tuple, int]:
+    """
+    function parses branches separated by "|" up to the end of tokens or ")"
+    """
+    branches = []
+    while True:
+        branch, i = _parse_sequence(tokens, i)
+        branches.append(branch)
+        if i == len(tokens) or tokens[i].kind != "|":
+            break
+        i += 1
+
+    if len(branches) == 1:
+        return branches[0], i
+    return intern_node(("alt", tuple(branches))), i
+
+
+def _parse_sequence(tokens: list[Token], i: int) -> tuple[tuple, int]:
+    """
+    function parses atoms with their repetitions up to "|", ")" or the end of tokens
+    """
+    items: list[tuple] = []
+    while i < len(tokens) and tokens[i].kind not in "|)":
+        token = tokens[i]
+        match token.kind:
+            case "repeat":
+                if not items:
+                    raise AttributeError(f"Nothing to repeat at position {token.position}")
+                items[-1] = intern_node(("repeat", items[-1], *token.value))
+            case "(":
+                node, i = _parse_alternation(tokens, i+1)
+                if i == len(tokens):
+                    raise AttributeError("Missing ')'")
+                items.append(node)
+            case "class":
+                items.append(intern_node(("class", *token.value)))
+            case "dot":
+                items.append(intern_node(("dot",)))
+            case _:
+                items.append(intern_node(("char", token.value)))
+        i += 1
+
+    if len(items) == 1:
+        return items[0], i
+    return intern_node(("concat", tuple(items))), i
+
+
+def _literal_runs(node: tuple, runs: list[str]) -> tuple[str | None, str, str]:
+    """
+    function adds to runs literals contained in every string matched by node and returns
+    the literal node matches (None if it matches other strings too), literal prefix
+    and literal suffix of every string matched by node
+    """
+    match node:
+        case ("char", char):
+            return char, char, char
+        case ("concat", items):
+            exact: str | None = ""
+            prefix = run = ""
+            for item in items:
+                item_exact, item_prefix, item_suffix = _literal_runs(item, runs)
+                if item_exact is not None:
+                    run += item_exact
+                    if exact is not None:
+                        exact += item_exact
+                    continue
+                # run before the item goes on with its prefix, a new one starts at its suffix
+                runs.append(run + item_prefix)
+                run = item_suffix
+                if exact is not None:
+                    prefix = exact + item_prefix
+                    exact = None
+            if exact is not None:
+                return exact, exact, exact
+            runs.append(run)
+            return None, prefix, run
+        case ("repeat", item, min_count, max_count) if min_count > 0:
+            item_exact, item_prefix, item_suffix = _literal_runs(item, runs)
+            if item_exact is None:
+                return None, item_prefix, item_suffix
+            if not item_exact:
+                return "", "", ""
+            # matched strings start and end with at least min_count copies of the literal
+            copies = min(min_count, MAX_LITERAL_LENGTH // len(item_exact) + 1)
+            repeated = item_exact * copies
+            if max_count == min_count and copies == min_count:
+                return repeated, repeated, repeated
+            runs.append(repeated)
+            return None, repeated, repeated
+        case ("alt", branches):
+            infos = [_literal_runs(branch, []) for branch in branches]
+            prefix = os.path.commonprefix([branch_prefix for _, branch_prefix, _ in infos])
+            suffix = os.path.commonprefix([branch_suffix[::-1] for _, _, branch_suffix in infos])[::-1]
+            return None, prefix, suffix
+    return None, "", ""
+
+
+def literal_runs(node: tuple) -> list[str]:
+    """
+    function returns literals contained in every string matched by parsed pattern,
+    found in one walk over the tree
+    """
+    runs: list[str] = []
+    exact, prefix, suffix = _literal_runs(node, runs)
+    runs.extend((prefix, suffix) if exact is None else (exact,))
+    return [run[:MAX_LITERAL_LENGTH] for run in runs if run]
+
+
+class ShiftAndMasks(NamedTuple):
+    """
+    masks of bit-parallel simulation of linear pattern, bit i is state with id i:
+    forward are states entered from previous state by their character, loop are
+    states repeating their character, optional are runs of states entered from
+    previous state by epsilon transition together with that previous state,
+    first and last are the lowest and the highest bit of every run
+    """
+    forward: int
+    loop: int
+    optional: int
+    first: int
+    last: int
+
+
+def shift_and_masks(states: Sequence[State]) -> ShiftAndMasks | None:
+    """
+    function returns masks of Shift-And simulation if states form a linear chain where
+    every state is entered only from the previous one (by character or by epsilon transition)
+    and may loop on itself, None is returned for other shapes and for too many states
+    """
+    if len(states) > MAX_SHIFT_AND_STATES or len(states) < 2:
+        return None
+
+    forward = loop = optional = first = last = 0
+    for state_id, state in enumerate(states):
+        if state_id > 0 and not isinstance(state, (AsciiState, DotState, CharClassState)):
+            return None
+
+        if state in state.next_states:
+            loop |= 1 << state_id
+        next_states = state.next_states - {state}
+        if len(next_states) + len(state.epsilon_transition_states) > 1:
+            return None
+        if state_id == len(states)-1:
+            if next_states or state.epsilon_transition_states:
+                return None
+            break
+
+        next_state = states[state_id+1]
+        if next_state in next_states:
+            forward |= 1 << state_id+1
+        elif next_state in state.epsilon_transition_states:
+            # run continues if this state was entered by epsilon transition too
+            if last >> state_id & 1:
+                last ^= 1 << state_id
+            else:
+                first |= 1 << state_id
+            last |= 1 << state_id+1
+            optional |= 3 << state_id
+        else:
+            return None
+
+    return ShiftAndMasks(forward, loop, optional, first, last)
+
+
+def walk_states(start_state: State) -> Iterator[State]:
+    """
+    function yields every state reachable from start state by next or epsilon transitions
+    once, in breadth-first order, without recursion
+    """
+    visited = {start_state}
+    queue = [start_state]
+    for state in queue:
+        yield state
+        for next_state in (*state.next_states, *state.epsilon_transition_states):
+            if next_state not in visited:
+                visited.add(next_state)
+                queue.append(next_state)
+
+
+def epsilon_closure_masks(states: Sequence[State]) -> list[int]:
+    """
+    function returns bitmask of epsilon closure of every state, states are indexed by id.
+    Strongly connected components of epsilon transitions are found by iterative Tarjan's
+    algorithm, every component shares one closure built from closures of components it reaches,
+    so the work is linear in number of transitions (times size of a bitmask)
+    """
+    closure_masks = [0] * len(states)
+    indices: dict[State, int] = {}
+    low_links: dict[State, int] = {}
+    component_stack: list[State] = []
+    on_stack: set[State] = set()
+
+    for root in states:
+        if root in indices:
+            continue
+
+        indices[root] = low_links[root] = len(indices)
+        component_stack.append(root)
+        on_stack.add(root)
+        work = [(root, iter(root.epsilon_transition_states))]
+        while work:
+            state, next_states = work[-1]
+            for next_state in next_states:
+                if next_state not in indices:
+                    indices[next_state] = low_links[next_state] = len(indices)
+                    component_stack.append(next_state)
+                    on_stack.add(next_state)
+                    work.append((next_state, iter(next_state.epsilon_transition_states)))
+                    break
+                if next_state in on_stack:
+                    low_links[state] = min(low_links[state], indices[next_state])
+            else:
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    low_links[parent] = min(low_links[parent], low_links[state])
+                if low_links[state] != indices[state]:
+                    continue
+
+                component = []
+                while True:
+                    member = component_stack.pop()
+                    on_stack.discard(member)
+                    component.append(member)
+                    if member is state:
+                        break
+
+                # components reached from this one are already finished
+                closure_mask = 0
+                for member in component:
+                    closure_mask |= 1 << member.state_id
+                    for next_state in member.epsilon_transition_states:
+                        closure_mask |= closure_masks[next_state.state_id]
+                for member in component:
+                    closure_masks[member.state_id] = closure_mask
+
+    return closure_masks
+
+
+def iter_state_ids(states: int) -> Iterator[int]:
+    """
+    function yields ids of states in bitmask in increasing order
+    """
+    while states:
+        lowest_bit = states & -states
+        yield lowest_bit.bit_length()-1
+        states ^= lowest_bit
+
+
+def pattern_digest(patterns: str | Sequence[str]) -> bytes:
+    """
+    function returns SHA-256 digest of pattern or of list of patterns
+    """
+    digest = hashlib.sha256()
+    if isinstance(patterns, str):
+        digest.update(b"pattern\0" + patterns.encode("utf-8", "surrogatepass"))
+    else:
+        digest.update(b"patterns\0")
+        for pattern in patterns:
+            encoded = pattern.encode("utf-8", "surrogatepass")
+            digest.update(len(encoded).to_bytes(8, "little") + encoded)
+    return digest.digest()
+
+
+class DFATable:
+    """
+    Cached DFA states and transitions, ids of DFA states index the lists.
+    DFA state with id DEAD_STATE has no NFA states, start state goes right after it.
+    Transitions by bytes are kept in 256-entry rows, states share UNKNOWN_BYTE_ROW
+    until their first byte transition is added. Transitions by characters are keyed
+    by the character, their estimated memory is summed in transition_bytes
+    """
+    def __init__(self) -> None:
+        self.nfa_states: list[int] = []
+        self.transitions: list[dict[str, int]] = []
+        self.byte_transitions: list[list[int]] = []
+        self.accepting: list[bool] = []
+        self.index: dict[int, int] = {}
+        self.start: int = DEAD_STATE + 1
+        self.transition_bytes = 0
 
-    def __update_cur_states(self, char: str) -> None:
+    def add_state(self, states: int, is_accepting: bool) -> int:
         """
-        function updates current states
+        function adds DFA state for given bitmask of NFA states and returns its id
         """
-        new_states = set()
-        for state in self.__cur_states:
-            next_states = state.get_next_states(char)
+        dfa_state = len(self.nfa_states)
+        self.nfa_states.append(states)
+        self.transitions.append({})
+        self.byte_transitions.append(UNKNOWN_BYTE_ROW)
+        self.accepting.append(is_accepting)
+        self.index[states] = dfa_state
+        return dfa_state
 
-            for next_state in next_states:
-                new_states.update(next_state.epsilon_closure())
 
-        self.__cur_states = new_states
+class EarlyExitStats:
+    """
+    Counters of matches finished before the whole input was consumed
+    """
+    def __init__(self) -> None:
+        self.early_exits = 0
+        self.skipped_chars = 0
+        self.__lock = threading.Lock()
 
-    def __reset_machine(self) -> None:
+    def add(self, skipped_chars: int) -> None:
         """
-        function resets FSM
+        function records one early exit which skipped given number of characters
         """
-        self.__cur_states = self.__start_states
+        with self.__lock:
+            self.early_exits += 1
+            self.skipped_chars += skipped_chars
 
-    def check_string(self, string: str) -> bool:
+
+class MatchCounters:
+    """
+    Counters of one match collected while instrumentation is enabled
+    """
+    __slots__ = ("chars_consumed", "peak_active_states", "total_active_states",
+                 "closure_computations", "dfa_hits", "dfa_misses")
+
+    def __init__(self) -> None:
+        self.chars_consumed = 0
+        self.peak_active_states = 0
+        self.total_active_states = 0
+        self.closure_computations = 0
+        self.dfa_hits = 0
+        self.dfa_misses = 0
+
+    def add_step(self, active_states: int) -> None:
         """
-        checks whether string is accepted by FSM
+        function records one consumed character and number of NFA states active after it
         """
-        if self.start_state is None:
+        self.chars_consumed += 1
+        self.total_active_states += active_states
+        if active_states > self.peak_active_states:
+            self.peak_active_states = active_states
+
+    def as_dict(self) -> dict[str, int]:
+        """
+        function returns counters by name
+        """
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class MatchStats:
+    """
+    Opt-in counters of matching work of one FSM summed over finished matches.
+    Hooks are called with MatchCounters of every finished match,
+    so the counters can be exported to a metrics system
+    """
+    def __init__(self, dfa: LazyDFA | None, compile_seconds: dict[str, float]) -> None:
+        self.matches = 0
+        self.prefilter_rejections = 0
+        self.chars_consumed = 0
+        self.peak_active_states = 0
+        self.total_active_states = 0
+        self.closure_computations = 0
+        self.dfa_hits = 0
+        self.dfa_misses = 0
+        self.compile_seconds = compile_seconds
+        self.hooks: list[Callable[[MatchCounters], None]] = []
+        self.__dfa = dfa
+        self.__lock = threading.Lock()
+
+    @property
+    def dfa_evictions(self) -> int:
+        """
+        number of times the lazy DFA cache was flushed
+        """
+        return self.__dfa.evictions if self.__dfa is not None else 0
+
+    @property
+    def average_active_states(self) -> float:
+        """
+        average number of NFA states active after one consumed character
+        """
+        return self.total_active_states / self.chars_consumed if self.chars_consumed else 0.0
+
+    def add_hook(self, hook: Callable[[MatchCounters], None]) -> None:
+        """
+        function registers callback called with counters of every finished match
+        """
+        self.hooks.append(hook)
+
+    def record(self, counters: MatchCounters) -> None:
+        """
+        function adds counters of finished match and passes them to hooks
+        """
+        with self.__lock:
+            self.matches += 1
+            self.chars_consumed += counters.chars_consumed
+            self.total_active_states += counters.total_active_states
+            self.peak_active_states = max(self.peak_active_states, counters.peak_active_states)
+            self.closure_computations += counters.closure_computations
+            self.dfa_hits += counters.dfa_hits
+            self.dfa_misses += counters.dfa_misses
+
+        for hook in self.hooks:
+            hook(counters)
+
+    def record_rejection(self) -> None:
+        """
+        function records input rejected by literal prefilter without running the automaton
+        """
+        with self.__lock:
+            self.matches += 1
+            self.prefilter_rejections += 1
+
+    def as_dict(self) -> dict:
+        """
+        function returns all counters by name
+        """
+        with self.__lock:
+            return {
+                "matches": self.matches,
+                "prefilter_rejections": self.prefilter_rejections,
+                "chars_consumed": self.chars_consumed,
+                "peak_active_states": self.peak_active_states,
+                "average_active_states": self.average_active_states,
+                "closure_computations": self.closure_computations,
+                "dfa_hits": self.dfa_hits,
+                "dfa_misses": self.dfa_misses,
+                "dfa_evictions": self.dfa_evictions,
+                "compile_seconds": dict(self.compile_seconds),
+            }
+
+
+class LazyDFA:
+    """
+    DFA built lazily from the NFA: every distinct set of NFA states becomes
+    a DFA state the first time it is reached and every transition is memoized.
+    Cached transitions are read without locking, only new states and
+    transitions are added under the lock. Cache is full when it has max_states states
+    or when estimated memory of its states and transitions by characters exceeds max_bytes
+    """
+    def __init__(self, start_states: int, accept_mask: int, max_states: int,
+                 max_bytes: int | None = None, state_bytes: int = DFA_STATE_BYTES) -> None:
+        self.max_states = max_states
+        self.max_bytes = max_bytes
+        self.evictions = 0
+        self.__state_bytes = state_bytes
+        self.__start_states = start_states
+        self.__accept_mask = accept_mask
+        self.__lock = threading.Lock()
+
+        self.table = self.__new_table()
+
+    def __new_table(self) -> DFATable:
+        """
+        function creates table with dead state and start state only
+        """
+        table = DFATable()
+        for states in (0, self.__start_states):
+            table.add_state(states, bool(states & self.__accept_mask))
+        return table
+
+    def flush(self) -> None:
+        """
+        function drops every cached DFA state and transition except the dead and start states,
+        matchers still holding the previous table keep using it safely
+        """
+        table = self.__new_table()
+        with self.__lock:
+            self.table = table
+            self.evictions += 1
+
+    def __add_state(self, table: DFATable, states: int) -> int | None:
+        """
+        function returns id of DFA state for given bitmask of NFA states,
+        None is returned when the cache is full
+        """
+        dfa_state = table.index.get(states)
+        if dfa_state is not None:
+            return dfa_state
+
+        if len(table.nfa_states) >= self.max_states:
+            return None
+
+        return table.add_state(states, bool(states & self.__accept_mask))
+
+    def __exceeds_max_bytes(self, table: DFATable, transition_bytes: int) -> bool:
+        """
+        function checks whether adding transition of given memory, whose next state
+        may be a new one as well, would exceed max_bytes
+        """
+        if self.max_bytes is None:
             return False
+        state_bytes = (len(table.nfa_states) + 1) * self.__state_bytes
+        return state_bytes + table.transition_bytes + transition_bytes > self.max_bytes
+
+    def add_transition(self, table: DFATable, dfa_state: int, char: str, next_states: int) -> int | None:
+        """
+        function memoizes transition from DFA state by given character,
+        None is returned when the cache is full. Every distinct character of input
+        adds a transition, so their memory is counted against max_bytes
+        """
+        transition_bytes = DFA_TRANSITION_BYTES if ord(char) < 256 else DFA_TRANSITION_BYTES + DFA_CHAR_KEY_BYTES
+        with self.__lock:
+            if self.__exceeds_max_bytes(table, transition_bytes):
+                return None
 
-        for char in string:
-            self.__update_cur_states(char)
+            next_dfa_state = self.__add_state(table, next_states)
+            if next_dfa_state is not None:
+                transitions = table.transitions[dfa_state]
+                if char not in transitions:
+                    table.transition_bytes += transition_bytes
+                transitions[char] = next_dfa_state
+        return next_dfa_state
 
-        for state in self.__cur_states:
-            if state.is_accept_state:
-                self.__reset_machine()
-                return True
+    def add_byte_transition(self, table: DFATable, dfa_state: int, byte: int, next_states: int) -> int | None:
+        """
+        function memoizes transition from DFA state by given byte,
+        None is returned when the cache is full
+        """
+        with self.__lock:
+            # byte rows are included in memory of states
+            if self.__exceeds_max_bytes(table, 0):
+                return None
 
-        self.__reset_machine()
-        return False
+            next_dfa_state = self.__add_state(table, next_states)
+            if next_dfa_state is not None:
+                row = table.byte_transitions[dfa_state]
+                if row is UNKNOWN_BYTE_ROW:
+                    row = list(UNKNOWN_BYTE_ROW)
+                    table.byte_transitions[dfa_state] = row
+                row[byte] = next_dfa_state
+        return next_dfa_state
+
+
+class CodeClassMap(dict):
+    """
+    Mapping of code points to characters whose code is the class of the code point,
+    it is used by str.translate. Codes below 256 are looked up in dense class table,
+    higher codes by bisection of code range starts, classes of at most
+    MAX_MEMOIZED_CODES codes are memoized
+    """
+    __slots__ = ("class_table", "range_starts", "range_classes")
+
+    def __init__(self, class_table: bytes | memoryview, range_starts: Sequence[int],
+                 range_classes: Sequence[int]) -> None:
+        super().__init__()
+        self.class_table = class_table
+        self.range_starts = range_starts
+        self.range_classes = range_classes
+
+    def class_of(self, code: int) -> int:
+        """
+        function returns class of character with given code point
+        """
+        if code < CharSet.BITMAP_SIZE:
+            return self.class_table[code]
+        return self.range_classes[bisect_right(self.range_starts, code) - 1]
+
+    def __missing__(self, code: int) -> str:
+        class_char = chr(self.class_of(code))
+        if len(self) < MAX_MEMOIZED_CODES:
+            self[code] = class_char
+        return class_char
+
+
+class DenseDFA:
+    """
+    Fully determinized and minimized DFA. Characters are mapped to equivalence
+    classes of characters accepted by the same NFA states, bytes (and characters below 256)
+    by dense class table, higher code points by bisection of sorted code ranges,
+    transitions are kept in one flat list indexed by state offset plus class,
+    where state offset is id of the state multiplied by number of classes.
+    State with id DEAD_STATE is dead, state right after it is accepting sink
+    if the DFA has one.
+    DFA can be saved to file and loaded back by mmap, then the tables are
+    memoryviews of the mapped file
+    """
+    def __init__(self, class_table: bytes | memoryview, range_starts: Sequence[int], range_classes: Sequence[int],
+                 class_count: int, transitions: list[int] | memoryview, accepting: list[bool] | memoryview,
+                 start: int, has_sink: bool, digest: bytes = b"", mapping: mmap | None = None) -> None:
+        self.class_table = class_table
+        # code points from range_starts[i] up to the next start belong to range_classes[i]
+        self.range_starts = range_starts
+        self.range_classes = range_classes
+        self.code_classes = CodeClassMap(class_table, range_starts, range_classes)
+        self.class_count = class_count
+        self.transitions = transitions
+        self.accepting = accepting
+        self.start = start
+        self.has_sink = has_sink
+        self.digest = digest
+        self.early_exit_stats = EarlyExitStats()
+        # mapped file stays open while its memoryviews are in use
+        self.__mapping = mapping
+
+    @property
+    def state_count(self) -> int:
+        """
+        number of states of DFA, including dead state
+        """
+        return len(self.accepting)
+
+    @classmethod
+    def from_fsm(cls, fsm: RegexFSM, max_states: int) -> DenseDFA | None:
+        """
+        function determinizes FSM by subset construction over character classes and minimizes
+        the result, None is returned when DFA would have more than max_states states
+        """
+        class_ids: dict[int, int] = {}
+        representatives = []
+        class_table = bytearray(256)
+        for byte, char_mask in enumerate(fsm.byte_masks):
+            if char_mask not in class_ids:
+                class_ids[char_mask] = len(representatives)
+                representatives.append(byte)
+            class_table[byte] = class_ids[char_mask]
+
+        # code ranges above 255 share classes with bytes accepted by the same states
+        range_classes = array("I")
+        for range_start, char_mask in zip(fsm.range_starts, fsm.range_masks):
+            if char_mask not in class_ids:
+                class_ids[char_mask] = len(representatives)
+                representatives.append(range_start)
+            range_classes.append(class_ids[char_mask])
+        class_count = len(representatives)
+
+        nfa_states = [0, fsm.start_states]
+        index = {0: DEAD_STATE, fsm.start_states: DEAD_STATE + 1}
+        transitions: list[list[int]] = []
+        for states in nfa_states:
+            row = []
+            for code in representatives:
+                next_states = fsm.move(states, chr(code))
+                if next_states not in index:
+                    if len(nfa_states) >= max_states:
+                        return None
+                    index[next_states] = len(nfa_states)
+                    nfa_states.append(next_states)
+                row.append(index[next_states])
+            transitions.append(row)
+
+        accepting = [bool(states & fsm.accept_mask) for states in nfa_states]
+        return cls.__minimized(bytes(class_table), array("I", fsm.range_starts), range_classes, class_count,
+                               transitions, accepting, DEAD_STATE + 1, fsm.digest())
+
+    @classmethod
+    def __minimized(cls, class_table: bytes, range_starts: array, range_classes: array, class_count: int,
+                    transitions: list[list[int]], accepting: list[bool], start: int, digest: bytes) -> DenseDFA:
+        """
+        function merges equivalent states by Hopcroft's partition refinement
+        """
+        state_count = len(transitions)
+        inverse = [[[] for _ in range(state_count)] for _ in range(class_count)]
+        for state, row in enumerate(transitions):
+            for class_id, next_state in enumerate(row):
+                inverse[class_id][next_state].append(state)
+
+        accept_block = {state for state in range(state_count) if accepting[state]}
+        reject_block = set(range(state_count)) - accept_block
+        blocks = [block for block in (accept_block, reject_block) if block]
+        block_of = [0] * state_count
+        for block_id, block in enumerate(blocks):
+            for state in block:
+                block_of[state] = block_id
+
+        worklist = set(range(len(blocks)))
+        while worklist:
+            splitter = list(blocks[worklist.pop()])
+            for class_id in range(class_count):
+                predecessors: dict[int, set[int]] = {}
+                for state in splitter:
+                    for prev_state in inverse[class_id][state]:
+                        predecessors.setdefault(block_of[prev_state], set()).add(prev_state)
+
+                for block_id, inside in predecessors.items():
+                    block = blocks[block_id]
+                    if len(inside) == len(block):
+                        continue
+
+                    outside = block - inside
+                    smaller, larger = (inside, outside) if len(inside) <= len(outside) else (outside, inside)
+                    blocks[block_id] = larger
+                    blocks.append(smaller)
+                    for state in smaller:
+                        block_of[state] = len(blocks)-1
+                    worklist.add(len(blocks)-1)
+
+        # dead block goes first, accepting sink right after it, then the rest
+        order = [block_of[DEAD_STATE]]
+        sink_blocks = [block_id for block_id, block in enumerate(blocks) if accepting[next(iter(block))] and
+                       all(block_of[next_state] == block_id for next_state in transitions[next(iter(block))])]
+        order.extend(sink_blocks)
+        order.extend(block_id for block_id in range(len(blocks)) if block_id not in order)
+        new_ids = {block_id: new_id for new_id, block_id in enumerate(order)}
+
+        flat_transitions = []
+        min_accepting = []
+        for block_id in order:
+            state = next(iter(blocks[block_id]))
+            flat_transitions.extend(new_ids[block_of[next_state]] * class_count for next_state in transitions[state])
+            min_accepting.append(accepting[state])
+
+        return cls(class_table, range_starts, range_classes, class_count, flat_transitions, min_accepting,
+                   new_ids[block_of[start]], bool(sink_blocks), digest)
+
+    def save(self, path: str | os.PathLike) -> None:
+        """
+        function writes DFA to binary file: header, class of every byte,
+        little-endian uint32 starts and classes of code ranges, accepting flag
+        of every state and little-endian uint32 transitions aligned to 4 bytes
+        """
+        header = DFA_FILE_HEADER.pack(DFA_FILE_MAGIC, DFA_FILE_VERSION, DFA_FILE_HAS_SINK if self.has_sink else 0,
+                                      self.class_count, len(self.range_starts), self.state_count, self.start,
+                                      self.digest)
+        tables = [array("I", self.range_starts), array("I", self.range_classes), array("I", self.transitions)]
+        if sys.byteorder == "big":
+            for table in tables:
+                table.byteswap()
+        range_starts, range_classes, transitions = tables
+
+        accepting = bytes(self.accepting)
+        # everything before accepting flags is 4 bytes aligned
+        padding = bytes(-len(accepting) % 4)
+
+        with open(path, "wb") as file:
+            for part in (header, self.class_table, range_starts, range_classes, accepting, padding, transitions):
+                file.write(part)
+
+    @classmethod
+    def load(cls, path: str | os.PathLike, patterns: str | Sequence[str] | None = None) -> DenseDFA:
+        """
+        function maps DFA file into memory without copying the tables and without parsing
+        the pattern, if patterns are given the file must have been saved for them.
+        Header fields and every class and transition of the tables are bounds checked,
+        so a damaged file cannot make matching index outside the tables
+        """
+        with open(path, "rb") as file:
+            try:
+                mapping = mmap(file.fileno(), 0, access=ACCESS_READ)
+            except ValueError as error:
+                raise ValueError(f"{path} is not a DFA file") from error
+
+        if len(mapping) < DFA_FILE_HEADER.size:
+            raise ValueError(f"{path} is not a DFA file")
+        magic, version, flags, class_count, range_count, state_count, start, digest = \
+            DFA_FILE_HEADER.unpack_from(mapping)
+        if magic != DFA_FILE_MAGIC:
+            raise ValueError(f"{path} is not a DFA file")
+        if version != DFA_FILE_VERSION:
+            raise ValueError(f"DFA file version {version} is not supported, expected {DFA_FILE_VERSION}")
+        if patterns is not None and digest != pattern_digest(patterns):
+            raise ValueError(f"{path} was saved for another pattern")
+
+        classes_start = DFA_FILE_HEADER.size
+        range_starts_start = classes_start + 256
+        range_classes_start = range_starts_start + 4 * range_count
+        accepting_start = range_classes_start + 4 * range_count
+        transitions_start = accepting_start + state_count + (-(accepting_start + state_count) % 4)
+        transitions_end = transitions_start + 4 * state_count * class_count
+        if len(mapping) != transitions_end:
+            raise ValueError(f"{path} is truncated or corrupted")
+
+        view = memoryview(mapping)
+        tables = [view[start:end].cast("I") for start, end in ((range_starts_start, range_classes_start),
+                                                                (range_classes_start, accepting_start),
+                                                                (transitions_start, transitions_end))]
+        if sys.byteorder == "big":
+            tables = [array("I", table) for table in tables]
+            for table in tables:
+                table.byteswap()
+        range_starts, range_classes, transitions = tables
+
+        class_table = view[classes_start:range_starts_start]
+        if (not class_count or start >= state_count or range_count == 0 or range_starts[0] != CharSet.BITMAP_SIZE
+                or max(class_table) >= class_count or max(range_classes) >= class_count
+                or max(transitions) > (state_count-1) * class_count):
+            raise ValueError(f"{path} has classes or states out of bounds")
+
+        return cls(class_table, range_starts, range_classes, class_count, transitions,
+                   view[accepting_start:accepting_start+state_count], start,
+                   bool(flags & DFA_FILE_HAS_SINK), digest, mapping)
+
+    def check_bytes(self, data: bytes | bytearray) -> bool:
+        """
+        checks whether binary data is accepted by DFA, every byte is one character
+        """
+        return self.__run(data.translate(self.class_table))
+
+    def check_string(self, string: str) -> bool:
+        """
+        checks whether string is accepted by DFA, strings of characters below 256 are
+        translated to classes by dense table, other strings also by bisection of code ranges
+        """
+        try:
+            data = string.encode("latin-1")
+        except UnicodeEncodeError:
+            data = None
+        if data is not None:
+            return self.__run(data.translate(self.class_table))
+
+        classes = string.translate(self.code_classes)
+        if self.class_count <= 256:
+            return self.__run(classes.encode("latin-1"))
+        return self.__run(array("I", map(ord, classes)))
+
+    def __run(self, classes: bytes | array) -> bool:
+        """
+        function runs DFA over classes of consumed characters
+        """
+        transitions = self.transitions
+        # dead state has offset 0 and sink the next one
+        stop_offset = self.class_count if self.has_sink else DEAD_STATE
+        state_offset = self.start * self.class_count
+
+        if state_offset <= stop_offset:
+            return self.__stop(state_offset, len(classes))
+
+        class_ids = iter(classes)
+        for class_id in class_ids:
+            state_offset = transitions[state_offset + class_id]
+            if state_offset <= stop_offset:
+                return self.__stop(state_offset, length_hint(class_ids))
+
+        return bool(self.accepting[state_offset // self.class_count])
+
+    def __stop(self, state_offset: int, skipped_chars: int) -> bool:
+        """
+        function finishes match which reached dead state or accepting sink
+        """
+        if skipped_chars:
+            self.early_exit_stats.add(skipped_chars)
+        return state_offset != DEAD_STATE
+
+    def class_chars(self) -> list[CharSet]:
+        """
+        function returns set of characters of every class
+        """
+        class_ranges: list[list[tuple[int, int]]] = [[] for _ in range(self.class_count)]
+        for byte, class_id in enumerate(self.class_table):
+            class_ranges[class_id].append((byte, byte))
+        range_ends = [*self.range_starts[1:], sys.maxunicode+1]
+        for range_start, range_end, class_id in zip(self.range_starts, range_ends, self.range_classes):
+            class_ranges[class_id].append((range_start, range_end-1))
+        return [CharSet(ranges) for ranges in class_ranges]
+
+
+class ResourceLimits(NamedTuple):
+    """
+    limits of resources used by FSM compiled from untrusted pattern, None is no limit.
+    Patterns needing more NFA states and longer inputs are refused with ValueError,
+    DFA limits cap the DFA cache and the FSM falls back to NFA simulation once it is full
+    """
+    max_nfa_states: int | None = None
+    max_dfa_states: int | None = None
+    max_dfa_bytes: int | None = None
+    max_input_length: int | None = None
+
+
+class ComplexityReport(NamedTuple):
+    """
+    static analysis of compiled FSM, bounds are worst cases over all inputs
+    """
+    nfa_states: int
+    # upper bound of NFA states active at once
+    max_active_states: int
+    # upper bound of DFA states built by subset construction
+    dfa_states_bound: int
+    # dfa_states_bound is above square of nfa_states, determinization could be exponential
+    exponential_dfa: bool
+    # DFA states allowed by dfa_cache_size and resource limits, 0 is NFA simulation only
+    dfa_states_limit: int
+
+
+class RegexFSM:
+    """
+    Finite State Machine for regex.
+    Matching changes shared state only in thread-safe ways: the lazy DFA cache grows
+    under a lock and may be flushed or dropped, so one instance can be shared by many threads
+    """
+    def __init__(self, regex_expr: str, dfa_cache_size: int = DEFAULT_DFA_CACHE_SIZE,
+                 minimize: bool = False, limits: ResourceLimits | None = None) -> None:
+        """
+        constructor for FSM, dfa_cache_size limits number of lazily built
+        DFA states (0 disables DFA and always simulates the NFA),
+        minimize builds whole minimized DFA up front if it fits into dfa_cache_size states,
+        limits restrict resources used by untrusted patterns and inputs
+        """
+        self.pattern = regex_expr
+        self.limits = limits
+        self.start_state = StartState(0)
+        self.compile_seconds: dict[str, float] = {}
+
+        start_time = time.perf_counter()
+        # parsed tree is shared with other FSMs compiled from the same pattern
+        self.ast = parse(regex_expr)
+        self._init_machine(self.ast, self.start_state, 1)
+        self.compile_seconds["parse"] = time.perf_counter() - start_time
+
+        self._compile_machine(dfa_cache_size, minimize)
+
+        start_time = time.perf_counter()
+        self.__extract_literals()
+        self.compile_seconds["literals"] = time.perf_counter() - start_time
+
+    def __reduce__(self) -> tuple:
+        """
+        FSM is pickled as its pattern and settings and compiled again when unpickled,
+        which is much smaller than the graph of states and the DFA cache
+        """
+        return (self.__class__, (self.pattern, self.dfa_cache_size, self.minimize, self.limits))
+
+    def __build_fragment(self, node: tuple, prev_state: State, state_ids: Iterator[int]) -> State:
+        """
+        function adds states of parsed node after prev_state (Thompson construction)
+        and returns the state which is active once the node is matched
+        """
+        match node:
+            case ("concat", items):
+                for item in items:
+                    prev_state = self.__build_fragment(item, prev_state, state_ids)
+                return prev_state
+            case ("alt", branches):
+                exit_state = EpsilonState(next(state_ids))
+                for branch in branches:
+                    self.__build_fragment(branch, prev_state, state_ids).add_next_state(exit_state, True)
+                return exit_state
+            case ("repeat", item, min_count, max_count):
+                return self.__build_repeat(item, min_count, max_count, prev_state, state_ids)
+            case _:
+                cur_state = self.__new_atom_state(node, next(state_ids))
+                prev_state.add_next_state(cur_state)
+                return cur_state
+
+    def __build_repeat(self, item: tuple, min_count: int, max_count: int | None,
+                       prev_state: State, state_ids: Iterator[int]) -> State:
+        """
+        function adds states of repeated node, every copy is built again from the node
+        """
+        if max_count == 0:
+            return prev_state
+
+        # unbounded repetition keeps the last required copy for the loop
+        required_count = min_count if max_count is not None else max(min_count-1, 0)
+        for _ in range(required_count):
+            prev_state = self.__build_fragment(item, prev_state, state_ids)
+
+        if max_count is None:
+            if item[0] in ATOM_NODES:
+                cur_state = self.__new_atom_state(item, next(state_ids))
+                cur_state.add_loop()
+                prev_state.add_next_state(cur_state, epsilon_transition=min_count == 0)
+                return cur_state
+
+            loop_state = EpsilonState(next(state_ids))
+            prev_state.add_next_state(loop_state, True)
+            last_state = self.__build_fragment(item, loop_state, state_ids)
+            last_state.add_next_state(loop_state, True)
+            return loop_state if min_count == 0 else last_state
+
+        if max_count == min_count:
+            return prev_state
+
+        # optional copies are nested, each may leave to one shared exit,
+        # so only the copy reached by the input is active, not all of them
+        exit_state = EpsilonState(next(state_ids))
+        prev_state.add_next_state(exit_state, True)
+        for _ in range(max_count - min_count):
+            prev_state = self.__build_fragment(item, prev_state, state_ids)
+            prev_state.add_next_state(exit_state, True)
+        return exit_state
+
+    def __count_states(self, node: tuple) -> int:
+        """
+        function returns number of states Thompson construction adds for parsed node,
+        so patterns over the limit are refused before any state is created
+        """
+        match node:
+            case ("concat", items):
+                return sum(self.__count_states(item) for item in items)
+            case ("alt", branches):
+                return sum(self.__count_states(branch) for branch in branches) + 1
+            case ("repeat", item, min_count, max_count):
+                if max_count == 0:
+                    return 0
+                item_states = self.__count_states(item)
+                if max_count is None:
+                    # the same copies as __build_repeat: last required one loops
+                    loop_states = 1 if item[0] in ATOM_NODES else 1 + item_states
+                    return max(min_count-1, 0) * item_states + loop_states
+                optional_states = 1 + (max_count-min_count) * item_states if max_count > min_count else 0
+                return min_count * item_states + optional_states
+            case _:
+                return 1
+
+    @staticmethod
+    def __new_atom_state(node: tuple, state_id: int) -> State:
+        """
+        function creates state consuming one character of parsed atom
+        """
+        match node:
+            case ("dot",):
+                return DotState(state_id)
+            case ("class", char_set, is_negated):
+                return CharClassState(state_id, char_set, is_negated)
+            case ("char", char):
+                return AsciiState(state_id, char)
+        raise ValueError(f"Unknown node {node!r}")
+
+    def _init_machine(self, node: tuple, start_state: State, state_id: int) -> int:
+        """
+        function initializes FSM by adding states of parsed pattern after start state,
+        ids of new states start from state_id, next free id is returned
+        """
+        if self.limits is not None and self.limits.max_nfa_states is not None:
+            # ids below state_id belong to states created before, empty pattern adds one state
+            state_count = state_id + max(self.__count_states(node), 1)
+            if state_count > self.limits.max_nfa_states:
+                raise ValueError(f"Pattern needs {state_count} NFA states, "
+                                 f"limit is {self.limits.max_nfa_states}")
+
+        state_ids = count(state_id)
+        exit_state = self.__build_fragment(node, start_state, state_ids)
+        if exit_state is start_state:
+            # empty pattern, start state may be shared by other patterns
+            exit_state = EpsilonState(next(state_ids))
+            start_state.add_next_state(exit_state, True)
+        exit_state.is_accept_state = True
+
+        return next(state_ids)
+
+    def _compile_machine(self, dfa_cache_size: int, minimize: bool) -> None:
+        """
+        function flattens graph of states into arrays indexed by state id:
+        epsilon closure bitmask and next states bitmask for every state
+        and bitmask of accept states, then prepares lazy or minimized DFA
+        """
+        start_time = time.perf_counter()
+        self.states: list[State] = sorted(walk_states(self.start_state), key=lambda state: state.state_id)
+
+        self.closure_masks: list[int] = epsilon_closure_masks(self.states)
+        self.transition_masks: list[int] = []
+        self.accept_mask: int = 0
+        self.sink_mask: int = 0
+        for state in self.states:
+            transition_mask = 0
+            for next_state in state.next_states:
+                transition_mask |= 1 << next_state.state_id
+            self.transition_masks.append(transition_mask)
+
+            if state.is_accept_state:
+                self.accept_mask |= 1 << state.state_id
+
+        for state in self.states:
+            # state looping by any character with accept state in its closure
+            # (trailing ".*") stays accepting for the rest of input
+            if (self.closure_masks[state.state_id] & self.accept_mask and state in state.next_states
+                    and UNICODE_CHARS <= state.accepted_chars()):
+                self.sink_mask |= 1 << state.state_id
+
+        self.__byte_masks: list[int] | None = None
+        self.range_starts, self.range_masks = self.__split_code_ranges()
+
+        # linear patterns are moved by a few integer operations instead of per-state loops
+        self.shift_and: ShiftAndMasks | None = shift_and_masks(self.states)
+
+        self.start_states: int = self.closure_masks[self.start_state.state_id]
+
+        self.dfa_cache_size = dfa_cache_size
+        self.dfa_states_limit = self.__limit_dfa_states(dfa_cache_size)
+        self.max_input_length = self.limits.max_input_length if self.limits is not None else None
+        self.dfa: LazyDFA | None = None
+        if self.dfa_states_limit > 0:
+            max_dfa_bytes = self.limits.max_dfa_bytes if self.limits is not None else None
+            self.dfa = LazyDFA(self.start_states, self.accept_mask, self.dfa_states_limit,
+                               max_dfa_bytes, self.__dfa_state_bytes())
+
+        self.early_exit_stats = EarlyExitStats()
+        self.match_stats: MatchStats | None = None
+        self.compile_seconds["flatten"] = time.perf_counter() - start_time
+
+        # literals every accepted string starts with, ends with and contains
+        self.literal_prefix = ""
+        self.literal_suffix = ""
+        self.required_literal = ""
+        self.has_literals = False
+
+        self.minimize = minimize
+        self.dense_dfa: DenseDFA | None = None
+        if minimize and self.dfa_states_limit > 0:
+            start_time = time.perf_counter()
+            self.dense_dfa = DenseDFA.from_fsm(self, self.dfa_states_limit)
+            if self.dense_dfa is not None:
+                self.dense_dfa.early_exit_stats = self.early_exit_stats
+            self.compile_seconds["minimize"] = time.perf_counter() - start_time
+
+    def __limit_dfa_states(self, dfa_cache_size: int) -> int:
+        """
+        function returns number of DFA states allowed by dfa_cache_size and resource limits
+        """
+        limits = self.limits
+        if limits is None:
+            return dfa_cache_size
+
+        dfa_states = dfa_cache_size
+        if limits.max_dfa_states is not None:
+            dfa_states = min(dfa_states, limits.max_dfa_states)
+        if limits.max_dfa_bytes is not None:
+            dfa_states = min(dfa_states, limits.max_dfa_bytes // self.__dfa_state_bytes())
+        return max(dfa_states, 0)
+
+    def __dfa_state_bytes(self) -> int:
+        """
+        function returns estimated memory of one lazy DFA state with its bitmask of NFA states
+        """
+        return DFA_STATE_BYTES + len(self.states) // 8
+
+    def analyze(self) -> ComplexityReport:
+        """
+        function estimates worst case of matching without running it. NFA states entered
+        by one character must all accept it, so every DFA state except the start one
+        is a subset of states accepting some character, and active states are
+        in the epsilon closure of such a set
+        """
+        char_masks = set(self.byte_masks)
+        char_masks.update(self.range_masks)
+        char_masks.discard(0)
+
+        max_active_states = self.start_states.bit_count()
+        # dead and start states
+        dfa_states_bound = 2
+        for char_mask in char_masks:
+            closure = 0
+            for state_id in iter_state_ids(char_mask):
+                closure |= self.closure_masks[state_id]
+            max_active_states = max(max_active_states, closure.bit_count())
+            dfa_states_bound += (1 << char_mask.bit_count()) - 1
+
+        return ComplexityReport(len(self.states), max_active_states, dfa_states_bound,
+                                dfa_states_bound > len(self.states) ** 2, self.dfa_states_limit)
+
+    def _downgrade_dfa(self) -> None:
+        """
+        function handles full lazy DFA cache: without resource limits the cache is flushed
+        and built again, with limits the DFA is dropped and FSM keeps simulating the NFA,
+        matchers still holding the DFA table switch to NFA on their next missing transition
+        """
+        dfa = self.dfa
+        if dfa is None:
+            return
+        if self.limits is None:
+            dfa.flush()
+        else:
+            self.dfa = None
+
+    def check_input_length(self, length: int) -> None:
+        """
+        function raises ValueError when input is longer than resource limits allow
+        """
+        if self.max_input_length is not None and length > self.max_input_length:
+            raise ValueError(f"Input of {length} characters exceeds limit of {self.max_input_length}")
+
+    def __extract_literals(self) -> None:
+        """
+        function finds literal prefix, suffix and the longest other substring
+        required in every accepted string, they are checked by str methods
+        before running the automaton
+        """
+        literal_masks: dict[str, int] = {}
+        for state in self.states:
+            if isinstance(state, AsciiState):
+                literal_masks[state.char] = literal_masks.get(state.char, 0) | 1 << state.state_id
+
+        def single_literal(states: int) -> str | None:
+            """
+            function returns character if all given states accept only this same character
+            """
+            if not states:
+                return None
+            char = getattr(self.states[next(iter_state_ids(states))], "char", None)
+            if char is None or states & ~literal_masks[char]:
+                return None
+            return char
+
+        consuming_mask = 0
+        for transition_mask in self.transition_masks:
+            consuming_mask |= transition_mask
+
+        # prefix: characters consumed while every path has only one way to go
+        prefix = []
+        cur_states = self.start_states
+        while len(prefix) < MAX_LITERAL_LENGTH and not cur_states & self.accept_mask:
+            next_states = 0
+            for state_id in iter_state_ids(cur_states):
+                next_states |= self.transition_masks[state_id]
+
+            char = single_literal(next_states)
+            if char is None:
+                break
+            prefix.append(char)
+            cur_states = self.move(cur_states, char)
+
+        # suffix: the same walk backwards from accept states by reversed transitions
+        epsilon_sources: list[list[int]] = [[] for _ in self.states]
+        next_sources: list[list[int]] = [[] for _ in self.states]
+        for state in self.states:
+            for eps_state in state.epsilon_transition_states:
+                epsilon_sources[eps_state.state_id].append(state.state_id)
+            for next_state in state.next_states:
+                next_sources[next_state.state_id].append(state.state_id)
+
+        suffix = []
+        goal_ids = list(iter_state_ids(self.accept_mask))
+        while len(suffix) < MAX_LITERAL_LENGTH:
+            # states having some goal state in their closure
+            reaching_ids = set(goal_ids)
+            while goal_ids:
+                for source_id in epsilon_sources[goal_ids.pop()]:
+                    if source_id not in reaching_ids:
+                        reaching_ids.add(source_id)
+                        goal_ids.append(source_id)
+
+            reaching_states = 0
+            for state_id in reaching_ids:
+                reaching_states |= 1 << state_id
+            if reaching_states & self.start_states:
+                break
+
+            consumed_states = reaching_states & consuming_mask
+            char = single_literal(consumed_states)
+            if char is None:
+                break
+            suffix.append(char)
+
+            goal_ids = [source_id for state_id in iter_state_ids(consumed_states)
+                        for source_id in next_sources[state_id]]
+
+        self.literal_prefix = "".join(prefix)
+        self.literal_suffix = "".join(reversed(suffix))
+        self.required_literal = self.__find_required_literal()
+        self.has_literals = bool(self.literal_prefix or self.literal_suffix or self.required_literal)
+
+    def __find_required_literal(self) -> str:
+        """
+        function returns the longest literal contained in every accepted string,
+        found in parsed tree, other than the literal prefix and suffix
+        """
+        longest = ""
+        for run_literal in literal_runs(self.ast):
+            if run_literal in self.literal_prefix or run_literal in self.literal_suffix:
+                continue
+            if len(run_literal) > len(longest):
+                longest = run_literal
+        return longest
+
+    def prefilter(self, string: str | bytes | bytearray) -> bool:
+        """
+        function checks by fast str or bytes methods whether string can be accepted at all,
+        False means that string is surely rejected
+        """
+        if isinstance(string, str):
+            return (string.startswith(self.literal_prefix) and string.endswith(self.literal_suffix)
+                    and self.required_literal in string)
+
+        try:
+            prefix, suffix, required = (literal.encode("latin-1") for literal in
+                                        (self.literal_prefix, self.literal_suffix, self.required_literal))
+        except UnicodeEncodeError:
+            # every byte is a character below 256, so higher literal characters never occur
+            return False
+        return string.startswith(prefix) and string.endswith(suffix) and required in string
+
+    def __contains_literals(self, string: str, pos: int) -> bool:
+        """
+        function checks whether every required literal occurs in string after pos
+        """
+        return all(string.find(literal, pos) >= 0
+                   for literal in (self.literal_prefix, self.literal_suffix, self.required_literal))
+
+    def __split_code_ranges(self) -> tuple[list[int], list[int]]:
+        """
+        function splits code points from 256 up into ranges accepted by the same states,
+        returns sorted starts of the ranges and bitmask of states accepting each range
+        """
+        # ranges of one state are disjoint, so its bit flips at every range bound
+        flips: dict[int, int] = {}
+        for state in self.states:
+            state_bit = 1 << state.state_id
+            for first, last in state.accepted_chars().ranges:
+                if last < CharSet.BITMAP_SIZE:
+                    continue
+                first = max(first, CharSet.BITMAP_SIZE)
+                flips[first] = flips.get(first, 0) ^ state_bit
+                if last < sys.maxunicode:
+                    flips[last+1] = flips.get(last+1, 0) ^ state_bit
+
+        range_starts = [CharSet.BITMAP_SIZE]
+        range_masks = [0]
+        char_mask = 0
+        for start in sorted(flips):
+            char_mask ^= flips[start]
+            if start == range_starts[-1]:
+                range_masks[-1] = char_mask
+            elif char_mask != range_masks[-1]:
+                range_starts.append(start)
+                range_masks.append(char_mask)
+        return range_starts, range_masks
+
+    def __get_char_mask(self, char: str) -> int:
+        """
+        function returns bitmask of states which accept given character,
+        codes below 256 are looked up in dense table, higher ones by bisection of ranges
+        """
+        code = ord(char)
+        if code < CharSet.BITMAP_SIZE:
+            return self.byte_masks[code]
+        return self.range_masks[bisect_right(self.range_starts, code) - 1]
+
+    @property
+    def byte_masks(self) -> list[int]:
+        """
+        256-entry table with bitmask of states accepting every byte,
+        byte is treated as character with the same code (latin-1)
+        """
+        if self.__byte_masks is None:
+            byte_masks = [0] * 256
+            for state in self.states:
+                bitmap = state.accepted_chars().bitmap
+                while bitmap:
+                    byte = (bitmap & -bitmap).bit_length() - 1
+                    byte_masks[byte] |= 1 << state.state_id
+                    bitmap &= bitmap - 1
+            self.__byte_masks = byte_masks
+        return self.__byte_masks
+
+    def move(self, cur_states: int, char: str) -> int:
+        """
+        function returns bitmask of states reached from given states by given character
+        """
+        return self.__step(cur_states, self.__get_char_mask(char))
+
+    def move_byte(self, cur_states: int, byte: int) -> int:
+        """
+        function returns bitmask of states reached from given states by given byte
+        """
+        return self.__step(cur_states, self.byte_masks[byte])
+
+    def __step(self, cur_states: int, char_mask: int) -> int:
+        """
+        function returns bitmask of states reached from given states
+        by character accepted by states in char_mask
+        """
+        shift_and = self.shift_and
+        if shift_and is not None:
+            next_states = ((cur_states << 1) & shift_and.forward | cur_states & shift_and.loop) & char_mask
+
+            # runs of optional states are filled from their lowest active state up,
+            # the set last bit stops the borrow of subtraction inside every run
+            with_last = next_states | shift_and.last
+            return next_states | (shift_and.optional & (~(with_last - shift_and.first) ^ with_last))
+
+        transition_masks = self.transition_masks
+        next_states = 0
+        while cur_states:
+            lowest_bit = cur_states & -cur_states
+            next_states |= transition_masks[lowest_bit.bit_length()-1]
+            cur_states ^= lowest_bit
+
+        next_states &= char_mask
+
+        closure_masks = self.closure_masks
+        new_states = 0
+        while next_states:
+            lowest_bit = next_states & -next_states
+            new_states |= closure_masks[lowest_bit.bit_length()-1]
+            next_states ^= lowest_bit
+
+        return new_states
+
+    def digest(self) -> bytes:
+        """
+        function returns digest of pattern used to validate saved DFA files
+        """
+        return pattern_digest(self.pattern)
+
+    def save_dfa(self, path: str | os.PathLike) -> None:
+        """
+        function saves minimized DFA of FSM to file, which can be loaded by DenseDFA.load
+        """
+        dense_dfa = self.dense_dfa
+        if dense_dfa is None:
+            dense_dfa = DenseDFA.from_fsm(self, self.dfa_cache_size or DEFAULT_DFA_CACHE_SIZE)
+        if dense_dfa is None:
+            raise ValueError(f"DFA has more than {self.dfa_cache_size or DEFAULT_DFA_CACHE_SIZE} states")
+        dense_dfa.save(path)
+
+    def dfa_size(self) -> int:
+        """
+        function returns number of DFA states cached at the moment
+        """
+        dfa_size = 0
+        if self.dfa is not None:
+            dfa_size += len(self.dfa.table.nfa_states)
+        if self.dense_dfa is not None:
+            dfa_size += self.dense_dfa.state_count
+        return dfa_size
+
+    def matcher(self) -> Matcher:
+        """
+        function returns new matcher which keeps its own current states
+        """
+        return Matcher(self)
+
+    def enable_instrumentation(self, hook: Callable[[MatchCounters], None] | None = None) -> MatchStats:
+        """
+        function starts collecting counters of matches finished by check_string, check_bytes,
+        match_stream, RegexSet.matches and Matcher.finish, hook is called with counters of every match.
+        While enabled, characters are consumed one by one and minimized DFA is not used.
+        Disabled instrumentation costs one attribute check per call, not per character
+        """
+        if self.match_stats is None:
+            self.match_stats = MatchStats(self.dfa, self.compile_seconds)
+        if hook is not None:
+            self.match_stats.add_hook(hook)
+        return self.match_stats
+
+    def disable_instrumentation(self) -> MatchStats | None:
+        """
+        function stops collecting counters and returns counters collected so far
+        """
+        match_stats, self.match_stats = self.match_stats, None
+        return match_stats
+
+    def check_string(self, string: str) -> bool:
+        """
+        checks whether string is accepted by FSM
+        """
+        if self.start_state is None:
+            return False
+        self.check_input_length(len(string))
+
+        if self.has_literals and not self.prefilter(string):
+            if self.match_stats is not None:
+                self.match_stats.record_rejection()
+            return False
+
+        if self.match_stats is not None:
+            return Matcher(self).advance(string).finish()
+        if self.dense_dfa is not None:
+            return self.dense_dfa.check_string(string)
+        return Matcher(self).advance(string).is_accepting()
+
+    def check_bytes(self, data: bytes | bytearray | memoryview | mmap) -> bool:
+        """
+        checks whether binary data is accepted by FSM without decoding it,
+        every byte is one character
+        """
+        if isinstance(data, (bytes, bytearray)):
+            self.check_input_length(len(data))
+            if self.has_literals and not self.prefilter(data):
+                if self.match_stats is not None:
+                    self.match_stats.record_rejection()
+                return False
+            if self.match_stats is not None:
+                return Matcher(self).advance_bytes(data).finish()
+            if self.dense_dfa is not None:
+                return self.dense_dfa.check_bytes(data)
+        return Matcher(self).advance_bytes(data).finish()
+
+    def match_many(self, strings: Sequence[str]) -> np.ndarray | list[bool]:
+        """
+        checks every string of the batch, returns boolean NumPy array or list
+        of booleans when NumPy is not installed. Strings of characters below 256
+        are joined into one uint8 array and go through DFA table together,
+        one position at a time, until they are rejected or consumed
+        """
+        if np is None:
+            return [self.check_string(string) for string in strings]
+        if self.dfa is None:
+            return np.array([self.check_string(string) for string in strings], dtype=bool)
+        for string in strings:
+            self.check_input_length(len(string))
+
+        results = np.zeros(len(strings), dtype=bool)
+        batch_indices = []
+        encoded = []
+        for i, string in enumerate(strings):
+            if self.has_literals and not self.prefilter(string):
+                continue
+            try:
+                data = string.encode("latin-1")
+            except UnicodeEncodeError:
+                results[i] = self.check_string(string)
+                continue
+            batch_indices.append(i)
+            encoded.append(data)
+
+        if encoded:
+            results[batch_indices] = self.__match_batch(encoded)
+        return results
+
+    def __match_batch(self, encoded: list[bytes]) -> np.ndarray:
+        """
+        function runs lazy DFA table across batch of byte strings in lockstep,
+        strings reaching the dead state or their end drop out of the batch,
+        missing transitions are added only for bytes the live strings reach
+        """
+        lengths = np.fromiter(map(len, encoded), dtype=np.intp, count=len(encoded))
+        order = np.argsort(-lengths, kind="stable")
+        lengths = lengths[order]
+
+        joined = np.frombuffer(b"".join(encoded[i] for i in order), dtype=np.uint8)
+        # offsets of strings in joined bytes
+        offsets = np.zeros(len(encoded), dtype=np.intp)
+        np.cumsum(lengths[:-1], out=offsets[1:])
+
+        dfa = self.dfa
+        if dfa is None:
+            return np.array([self.check_bytes(data) for data in encoded], dtype=bool)
+        table = dfa.table
+        transitions = np.array(table.byte_transitions, dtype=np.int32)
+
+        # strings are sorted by length, so strings still running form a prefix
+        max_length = int(lengths[0])
+        active_counts = np.searchsorted(-lengths, -np.arange(max_length), side="left")
+        states = np.full(len(encoded), table.start, dtype=np.int32)
+        # strings still alive sorted like lengths, with their offsets and current states
+        live = np.arange(len(encoded))
+        live_offsets = offsets
+        live_states = states.copy()
+        for position in range(max_length):
+            running = np.searchsorted(live, active_counts[position])
+            if running < live.size:
+                states[live[running:]] = live_states[running:]
+                live, live_offsets, live_states = live[:running], live_offsets[:running], live_states[:running]
+            if not running:
+                break
+
+            data = joined[live_offsets + position]
+            next_states = transitions[live_states, data]
+            is_unknown = next_states == UNKNOWN_STATE
+            if is_unknown.any():
+                transitions = self.__add_byte_transitions(table, transitions, live_states[is_unknown],
+                                                          data[is_unknown])
+                if transitions is None:
+                    return np.array([self.check_bytes(data) for data in encoded], dtype=bool)
+                next_states = transitions[live_states, data]
+
+            live_states = next_states
+            is_alive = live_states != DEAD_STATE
+            if not is_alive.all():
+                states[live[~is_alive]] = DEAD_STATE
+                live, live_offsets, live_states = live[is_alive], live_offsets[is_alive], live_states[is_alive]
+        states[live] = live_states
+
+        results = np.empty(len(encoded), dtype=bool)
+        results[order] = np.array(table.accepting, dtype=bool)[states]
+        return results
+
+    def __add_byte_transitions(self, table: DFATable, transitions: np.ndarray, dfa_states: np.ndarray,
+                               data: np.ndarray) -> np.ndarray | None:
+        """
+        function adds to lazy DFA transitions of DFA states by bytes at the same positions
+        and returns byte transitions of all DFA states as NumPy array,
+        None is returned when the DFA cache overflows
+        """
+        dfa = self.dfa
+        if dfa is None:
+            return None
+
+        known_count = len(transitions)
+        for key in np.unique(dfa_states.astype(np.intp) * 256 + data).tolist():
+            dfa_state, byte = divmod(key, 256)
+            next_states = self.move_byte(table.nfa_states[dfa_state], byte)
+            next_state = dfa.add_byte_transition(table, dfa_state, byte, next_states)
+            if next_state is None:
+                return None
+            transitions[dfa_state, byte] = next_state
+
+        if len(table.byte_transitions) > known_count:
+            new_rows = np.array(table.byte_transitions[known_count:], dtype=np.int32)
+            transitions = np.concatenate((transitions, new_rows))
+        return transitions
+
+    def match_stream(self, source: Iterable[str] | TextIO, chunk_size: int = DEFAULT_STREAM_CHUNK_SIZE) -> bool:
+        """
+        checks whether input given in chunks by iterable or text file is accepted by FSM,
+        reading stops as soon as no state is alive
+        """
+        matcher = Matcher(self)
+        for chunk in iter_chunks(source, chunk_size):
+            if matcher.advance(chunk).is_dead():
+                break
+        return matcher.finish()
+
+    def __longest_match_end(self, string: str, start: int, moves: dict[tuple[int, str], int],
+                            failed: set[tuple[int, int]]) -> int:
+        """
+        function returns end of the longest match starting at start, -1 if there is none.
+        Pairs of position and NFA states reached after the last accepting position cannot
+        lead to a match, they are added to failed and later runs stop as soon as they
+        reach one, so every pair is stepped from at most once (maximal munch in linear time).
+        Transitions are memoized in moves for the whole scan of the string
+        """
+        accept_mask = self.accept_mask
+        sink_mask = self.sink_mask
+        states = self.start_states
+        last_end = start if states & accept_mask else -1
+
+        visited = []
+        for i in range(start, len(string)):
+            if states & sink_mask:
+                # accepting sink accepts the rest of the string, whatever it is
+                return len(string)
+
+            char = string[i]
+            next_states = moves.get((states, char))
+            if next_states is None:
+                next_states = self.move(states, char)
+                moves[(states, char)] = next_states
+            states = next_states
+
+            if not states:
+                break
+            pair = (i+1, states)
+            if pair in failed:
+                break
+            visited.append(pair)
+            if states & accept_mask:
+                last_end = i+1
+                visited.clear()
+
+        failed.update(visited)
+        return last_end
+
+    def __find_span(self, string: str, pos: int, moves: dict[tuple[int, str], int],
+                    failed: set[tuple[int, int]]) -> tuple[int, int] | None:
+        """
+        function finds leftmost-longest match starting at pos or later,
+        candidate starts are found by str.find of literal prefix
+        """
+        prefix = self.literal_prefix
+        for start in range(pos, len(string)+1):
+            if prefix:
+                if not string.startswith(prefix, start):
+                    start = string.find(prefix, start)
+                    if start < 0:
+                        return None
+            end = self.__longest_match_end(string, start, moves, failed)
+            if end >= 0:
+                return start, end
+        return None
+
+    def search(self, string: str, pos: int = 0) -> Match | None:
+        """
+        function returns leftmost-longest match found at pos or later, None if there is no match
+        """
+        self.check_input_length(len(string))
+        if self.has_literals and not self.__contains_literals(string, pos):
+            return None
+
+        span = self.__find_span(string, pos, {}, set())
+        if span is None:
+            return None
+        return Match(string, *span)
+
+    def finditer(self, string: str) -> Iterator[Match]:
+        """
+        function yields non-overlapping leftmost-longest matches from left to right,
+        positions known not to lead to a match are shared by searches after each match,
+        so the whole scan takes time linear in length of string
+        """
+        self.check_input_length(len(string))
+        if self.has_literals and not self.__contains_literals(string, 0):
+            return
+
+        moves: dict[tuple[int, str], int] = {}
+        failed: set[tuple[int, int]] = set()
+        pos = 0
+        while pos <= len(string):
+            span = self.__find_span(string, pos, moves, failed)
+            if span is None:
+                return
+
+            yield Match(string, *span)
+            start, end = span
+            pos = end if end > start else end+1
+
+    def findall(self, string: str) -> list[str]:
+        """
+        function returns list of all non-overlapping matched substrings
+        """
+        return [match.group() for match in self.finditer(string)]
+
+
+class Match:
+    """
+    Substring matched by FSM
+    """
+    __slots__ = ("string", "__start", "__end")
+
+    def __init__(self, string: str, start: int, end: int) -> None:
+        self.string = string
+        self.__start = start
+        self.__end = end
+
+    def start(self) -> int:
+        """
+        function returns index where match starts
+        """
+        return self.__start
+
+    def end(self) -> int:
+        """
+        function returns index right after the end of match
+        """
+        return self.__end
+
+    def span(self) -> tuple[int, int]:
+        """
+        function returns start and end of match
+        """
+        return self.__start, self.__end
+
+    def group(self) -> str:
+        """
+        function returns matched substring
+        """
+        return self.string[self.__start:self.__end]
+
+    def __repr__(self) -> str:
+        return f"<Match span={self.span()} match={self.group()!r}>"
+
+
+class Matcher:
+    """
+    Current states of one match against compiled RegexFSM.
+    Matcher is cheap to create and must not be shared between threads
+    """
+    __slots__ = ("fsm", "__dfa_table", "__cur_state", "__counters", "__input_length")
+
+    def __init__(self, fsm: RegexFSM) -> None:
+        self.fsm = fsm
+        self.reset()
+
+    def reset(self) -> None:
+        """
+        function moves matcher back to start states
+        """
+        self.__counters = MatchCounters() if self.fsm.match_stats is not None else None
+        self.__input_length = 0
+        if self.fsm.dfa is not None and not self.fsm.start_states & self.fsm.sink_mask:
+            self.__dfa_table: DFATable | None = self.fsm.dfa.table
+            self.__cur_state: int = self.__dfa_table.start
+        else:
+            self.__dfa_table = None
+            self.__cur_state = self.fsm.start_states
+
+    def advance(self, string: str) -> Matcher:
+        """
+        function consumes string using lazily built DFA,
+        stops as soon as no state is alive or an accepting sink is reached
+        """
+        if self.fsm.max_input_length is not None:
+            self.__count_input(len(string))
+        if self.__counters is not None:
+            return self.__advance_instrumented(string)
+
+        dfa_table = self.__dfa_table
+        if dfa_table is None:
+            return self.__advance_nfa(string)
+
+        transitions = dfa_table.transitions
+        cur_state = self.__cur_state
+
+        chars = iter(string)
+        for char in chars:
+            next_state = transitions[cur_state].get(char)
+            if not next_state:
+                if next_state is None:
+                    next_state = self.__add_transition(dfa_table, cur_state, char)
+                    if next_state is None:
+                        return self.__advance_nfa(string[len(string)-length_hint(chars):])
+
+                if next_state == DEAD_STATE:
+                    self.__cur_state = DEAD_STATE
+                    self.__skip(length_hint(chars))
+                    return self
+
+            cur_state = next_state
+
+        self.__cur_state = cur_state
+        return self
+
+    def advance_bytes(self, data: bytes | bytearray | memoryview | mmap) -> Matcher:
+        """
+        function consumes binary data, every byte is one character.
+        Other buffers than bytes and bytearray are read by blocks,
+        so only one block at a time is copied
+        """
+        if self.fsm.max_input_length is not None:
+            self.__count_input(len(data) if isinstance(data, (bytes, bytearray)) else memoryview(data).nbytes)
+        if isinstance(data, (bytes, bytearray)):
+            return self.__advance_bytes(data)
+
+        with memoryview(data) as view, view.cast("B") as byte_view:
+            for i in range(0, len(byte_view), DEFAULT_STREAM_CHUNK_SIZE):
+                if self.is_dead():
+                    self.__skip(len(byte_view)-i)
+                    break
+                self.__advance_bytes(byte_view[i:i+DEFAULT_STREAM_CHUNK_SIZE].tobytes())
+        return self
+
+    def __advance_bytes(self, data: bytes | bytearray) -> Matcher:
+        """
+        function consumes bytes using lazily built DFA with 256-entry rows of transitions,
+        stops as soon as no state is alive or an accepting sink is reached
+        """
+        if self.__counters is not None:
+            return self.__advance_instrumented(data)
+
+        dfa_table = self.__dfa_table
+        if dfa_table is None:
+            return self.__advance_nfa_bytes(data, 0)
+
+        byte_transitions = dfa_table.byte_transitions
+        cur_state = self.__cur_state
+
+        data_bytes = iter(data)
+        for byte in data_bytes:
+            next_state = byte_transitions[cur_state][byte]
+            if next_state <= DEAD_STATE:
+                if next_state == UNKNOWN_STATE:
+                    next_state = self.__add_byte_transition(dfa_table, cur_state, byte)
+                    if next_state is None:
+                        return self.__advance_nfa_bytes(data, len(data)-length_hint(data_bytes))
+
+                if next_state == DEAD_STATE:
+                    self.__cur_state = DEAD_STATE
+                    self.__skip(length_hint(data_bytes))
+                    return self
+
+            cur_state = next_state
+
+        self.__cur_state = cur_state
+        return self
+
+    def __add_transition(self, dfa_table: DFATable, cur_state: int, char: str) -> int | None:
+        """
+        function computes missing DFA transition by character
+        """
+        next_states = self.fsm.move(dfa_table.nfa_states[cur_state], char)
+        return self.__memoize(dfa_table, cur_state, char, next_states, False)
+
+    def __add_byte_transition(self, dfa_table: DFATable, cur_state: int, byte: int) -> int | None:
+        """
+        function computes missing DFA transition by byte
+        """
+        next_states = self.fsm.move_byte(dfa_table.nfa_states[cur_state], byte)
+        return self.__memoize(dfa_table, cur_state, byte, next_states, True)
+
+    def __memoize(self, dfa_table: DFATable, cur_state: int, char: str | int, next_states: int,
+                  is_byte: bool) -> int | None:
+        """
+        function adds computed transition to DFA, None is returned when matcher
+        has to continue by NFA simulation: next states contain accepting sink,
+        DFA cache overflowed or FSM was downgraded to NFA simulation
+        """
+        fsm = self.fsm
+        dfa = fsm.dfa
+        if dfa is not None and not next_states & fsm.sink_mask:
+            add_transition = dfa.add_byte_transition if is_byte else dfa.add_transition
+            next_state = add_transition(dfa_table, cur_state, char, next_states)
+            if next_state is not None:
+                return next_state
+            fsm._downgrade_dfa()
+
+        self.__dfa_table = None
+        self.__cur_state = next_states
+        return None
+
+    def __advance_nfa(self, string: str) -> Matcher:
+        """
+        function consumes string by simulating NFA,
+        stops as soon as no state is alive or an accepting sink is reached
+        """
+        if self.fsm.shift_and is not None:
+            return self.__advance_shift_and(string)
+
+        move = self.fsm.move
+        sink_mask = self.fsm.sink_mask
+        cur_states = self.__cur_state
+
+        for i, char in enumerate(string):
+            if not cur_states:
+                self.__skip(len(string)-i)
+                break
+
+            if cur_states & sink_mask:
+                # sink accepts rest of the string, whatever it is
+                self.__skip(len(string)-i)
+                break
+
+            cur_states = move(cur_states, char)
+
+        self.__cur_state = cur_states
+        return self
+
+    def __advance_shift_and(self, string: str) -> Matcher:
+        """
+        function consumes string by bit-parallel simulation of linear pattern,
+        the same step as RegexFSM.move with everything kept in local variables
+        """
+        fsm = self.fsm
+        forward, loop, optional, first, last = fsm.shift_and
+        byte_masks = fsm.byte_masks
+        range_starts = fsm.range_starts
+        range_masks = fsm.range_masks
+        sink_mask = fsm.sink_mask
+        cur_states = self.__cur_state
+
+        for i, char in enumerate(string):
+            if not cur_states:
+                self.__skip(len(string)-i)
+                break
+
+            if cur_states & sink_mask:
+                self.__skip(len(string)-i)
+                break
+
+            code = ord(char)
+            if code < 256:
+                char_mask = byte_masks[code]
+            else:
+                char_mask = range_masks[bisect_right(range_starts, code) - 1]
+            next_states = ((cur_states << 1) & forward | cur_states & loop) & char_mask
+            with_last = next_states | last
+            cur_states = next_states | (optional & (~(with_last - first) ^ with_last))
+
+        self.__cur_state = cur_states
+        return self
+
+    def __advance_nfa_bytes(self, data: bytes | bytearray, start: int) -> Matcher:
+        """
+        function consumes bytes from start position by simulating NFA,
+        stops as soon as no state is alive or an accepting sink is reached
+        """
+        move_byte = self.fsm.move_byte
+        sink_mask = self.fsm.sink_mask
+        cur_states = self.__cur_state
+
+        for i in range(start, len(data)):
+            if not cur_states:
+                self.__skip(len(data)-i)
+                break
+
+            if cur_states & sink_mask:
+                # every byte is a character accepted by sink
+                self.__skip(len(data)-i)
+                break
+
+            cur_states = move_byte(cur_states, data[i])
+
+        self.__cur_state = cur_states
+        return self
+
+    def __advance_instrumented(self, symbols: str | bytes | bytearray) -> Matcher:
+        """
+        function consumes characters or bytes one by one and records counters of the match,
+        it replaces the fast loops only while instrumentation is enabled
+        """
+        counters = self.__counters
+        is_bytes = not isinstance(symbols, str)
+
+        for i, symbol in enumerate(symbols):
+            dfa_table = self.__dfa_table
+            if dfa_table is not None:
+                if is_bytes:
+                    next_state = dfa_table.byte_transitions[self.__cur_state][symbol]
+                    if next_state == UNKNOWN_STATE:
+                        next_state = None
+                else:
+                    next_state = dfa_table.transitions[self.__cur_state].get(symbol)
+
+                if next_state is None:
+                    counters.dfa_misses += 1
+                    counters.closure_computations += 1
+                    if is_bytes:
+                        next_state = self.__add_byte_transition(dfa_table, self.__cur_state, symbol)
+                    else:
+                        next_state = self.__add_transition(dfa_table, self.__cur_state, symbol)
+                else:
+                    counters.dfa_hits += 1
+
+                # None means matcher switched to NFA simulation with next states set
+                if next_state is not None:
+                    self.__cur_state = next_state
+            else:
+                cur_states = self.__cur_state
+                if not cur_states or cur_states & self.fsm.sink_mask:
+                    if is_bytes:
+                        self.__advance_nfa_bytes(symbols, i)
+                    else:
+                        self.__advance_nfa(symbols[i:])
+                    break
+
+                counters.closure_computations += 1
+                if is_bytes:
+                    self.__cur_state = self.fsm.move_byte(cur_states, symbol)
+                else:
+                    self.__cur_state = self.fsm.move(cur_states, symbol)
+
+            active_states = self.nfa_states().bit_count()
+            counters.add_step(active_states)
+            if not active_states:
+                self.__skip(len(symbols)-i-1)
+                break
+
+        return self
+
+    def __count_input(self, length: int) -> None:
+        """
+        function adds length of consumed chunk to input length checked by resource limits
+        """
+        self.__input_length += length
+        self.fsm.check_input_length(self.__input_length)
+
+    def __skip(self, skipped_chars: int) -> None:
+        """
+        function records characters which were not consumed after early exit
+        """
+        if skipped_chars:
+            self.fsm.early_exit_stats.add(skipped_chars)
+
+    def feed(self, chunk: str) -> bool:
+        """
+        function consumes next chunk of input and returns
+        whether input consumed so far is accepted
+        """
+        return self.advance(chunk).is_accepting()
+
+    def finish(self) -> bool:
+        """
+        function returns whether whole input is accepted and resets matcher for next input
+        """
+        is_accepted = self.is_accepting()
+        match_stats = self.fsm.match_stats
+        if self.__counters is not None and match_stats is not None:
+            match_stats.record(self.__counters)
+        self.reset()
+        return is_accepted
+
+    def is_dead(self) -> bool:
+        """
+        function checks whether no continuation of input consumed so far can be accepted
+        """
+        return not self.nfa_states()
+
+    def nfa_states(self) -> int:
+        """
+        function returns bitmask of NFA states matcher is in
+        """
+        if self.__dfa_table is not None:
+            return self.__dfa_table.nfa_states[self.__cur_state]
+        return self.__cur_state
+
+    def is_accepting(self) -> bool:
+        """
+        function checks whether input consumed so far is accepted by FSM
+        """
+        if self.__dfa_table is not None:
+            return self.__dfa_table.accepting[self.__cur_state]
+        return bool(self.__cur_state & self.fsm.accept_mask)
+
+def iter_chunks(source: Iterable[str] | TextIO, chunk_size: int = DEFAULT_STREAM_CHUNK_SIZE) -> Iterator[str]:
+    """
+    function yields chunks of input from iterable or from file object read by chunk_size characters
+    """
+    if not hasattr(source, "read"):
+        yield from source
+        return
+
+    while chunk := source.read(chunk_size):
+        yield chunk
+
+
+class RegexSet(RegexFSM):
+    """
+    Many patterns compiled into one FSM. Patterns share the start state and
+    accept states are tagged with index of their pattern, so one pass over
+    the input tells which patterns matched
+    """
+    def __init__(self, patterns: Iterable[str], dfa_cache_size: int = DEFAULT_DFA_CACHE_SIZE,
+                 minimize: bool = False, limits: ResourceLimits | None = None) -> None:
+        """
+        constructor for FSM of pattern set, dfa_cache_size limits number of lazily
+        built DFA states (0 disables DFA and always simulates the NFA),
+        minimize builds minimized DFA used to check whether any pattern matches,
+        limits restrict resources used by all the patterns together
+        """
+        self.patterns: list[str] = list(patterns)
+        self.limits = limits
+        self.start_state = StartState(0)
+        self.compile_seconds: dict[str, float] = {}
+
+        start_time = time.perf_counter()
+        pattern_ids = []
+        state_id = 1
+        self.asts: list[tuple] = [parse(pattern) for pattern in self.patterns]
+        for node in self.asts:
+            next_state_id = self._init_machine(node, self.start_state, state_id)
+            pattern_ids.append(range(state_id, next_state_id))
+            state_id = next_state_id
+        self.compile_seconds["parse"] = time.perf_counter() - start_time
+
+        self._compile_machine(dfa_cache_size, minimize)
+
+        # accepting sink of one pattern says nothing about the others
+        self.sink_mask = 0
+
+        self.accept_tags: dict[int, int] = {}
+        for pattern_index, state_ids in enumerate(pattern_ids):
+            for state_id in state_ids:
+                if self.accept_mask >> state_id & 1:
+                    self.accept_tags[state_id] = pattern_index
+
+    def __reduce__(self) -> tuple:
+        return (self.__class__, (self.patterns, self.dfa_cache_size, self.minimize, self.limits))
+
+    def digest(self) -> bytes:
+        return pattern_digest(self.patterns)
+
+    def matches(self, string: str) -> list[int]:
+        """
+        function returns sorted indices of patterns which accept the string
+        """
+        matcher = Matcher(self).advance(string)
+        accepted_states = matcher.nfa_states() & self.accept_mask
+        if self.match_stats is not None:
+            # records counters of the match
+            matcher.finish()
+
+        matched = set()
+        while accepted_states:
+            lowest_bit = accepted_states & -accepted_states
+            matched.add(self.accept_tags[lowest_bit.bit_length()-1])
+            accepted_states ^= lowest_bit
+        return sorted(matched)
+
+
+class CacheInfo(NamedTuple):
+    """
+    statistics of PatternCache
+    """
+    hits: int
+    misses: int
+    maxsize: int
+    currsize: int
+    dfa_states: int
+    max_dfa_states: int
+
+
+class PatternCache:
+    """
+    LRU cache of compiled FSMs. Size is limited both by number of entries and
+    by total number of DFA states cached by the entries. Lazy DFAs keep growing
+    after their FSMs are cached, so the total is measured again whenever a pattern
+    is compiled and statistics are read, and growth of an entry is added on every hit
+    """
+    def __init__(self, maxsize: int = DEFAULT_PATTERN_CACHE_SIZE,
+                 max_dfa_states: int = DEFAULT_PATTERN_CACHE_DFA_STATES) -> None:
+        self.maxsize = maxsize
+        self.max_dfa_states = max_dfa_states
+        self.hits = 0
+        self.misses = 0
+        self.__entries: OrderedDict[tuple[str, int, bool, ResourceLimits | None], RegexFSM] = OrderedDict()
+        # DFA states of every entry when it was measured last
+        self.__entry_dfa_states: dict[tuple[str, int, bool, ResourceLimits | None], int] = {}
+        self.__dfa_states = 0
+        self.__lock = threading.Lock()
+
+    def get(self, regex_expr: str, dfa_cache_size: int = DEFAULT_DFA_CACHE_SIZE,
+            minimize: bool = False, limits: ResourceLimits | None = None) -> RegexFSM:
+        """
+        function returns compiled FSM for pattern, compiling it on cache miss
+        """
+        key = (regex_expr, dfa_cache_size, minimize, limits)
+        with self.__lock:
+            fsm = self.__entries.get(key)
+            if fsm is not None:
+                self.__entries.move_to_end(key)
+                self.hits += 1
+                dfa_states = fsm.dfa_size()
+                self.__dfa_states += dfa_states - self.__entry_dfa_states[key]
+                self.__entry_dfa_states[key] = dfa_states
+                if self.__dfa_states > self.max_dfa_states:
+                    self.__evict()
+                return fsm
+            self.misses += 1
+
+        fsm = RegexFSM(regex_expr, dfa_cache_size, minimize, limits)
+        if self.maxsize <= 0:
+            return fsm
+
+        with self.__lock:
+            self.__entries[key] = fsm
+            self.__entries.move_to_end(key)
+            self.__evict()
+        return fsm
+
+    def __measure(self) -> None:
+        """
+        function measures DFA states cached by every entry
+        """
+        self.__entry_dfa_states = {key: fsm.dfa_size() for key, fsm in self.__entries.items()}
+        self.__dfa_states = sum(self.__entry_dfa_states.values())
+
+    def __evict(self) -> None:
+        """
+        function drops least recently used entries until cache fits into its limits
+        """
+        self.__measure()
+        while len(self.__entries) > self.maxsize or \
+                (self.__dfa_states > self.max_dfa_states and len(self.__entries) > 1):
+            key, _ = self.__entries.popitem(last=False)
+            self.__dfa_states -= self.__entry_dfa_states.pop(key)
+
+    def purge(self) -> None:
+        """
+        function drops every compiled FSM from the cache
+        """
+        with self.__lock:
+            self.__entries.clear()
+            self.__entry_dfa_states.clear()
+            self.__dfa_states = 0
+
+    def info(self) -> CacheInfo:
+        """
+        function returns cache statistics, DFA states are measured again
+        """
+        with self.__lock:
+            self.__measure()
+            return CacheInfo(self.hits, self.misses, self.maxsize, len(self.__entries),
+                             self.__dfa_states, self.max_dfa_states)
+
+
+_pattern_cache = PatternCache()
+
+
+def compile(regex_expr: str, dfa_cache_size: int = DEFAULT_DFA_CACHE_SIZE, minimize: bool = False,
+            limits: ResourceLimits | None = None) -> RegexFSM:
+    """
+    function returns compiled FSM for pattern, reusing FSMs compiled before
+    """
+    return _pattern_cache.get(regex_expr, dfa_cache_size, minimize, limits)
+
+
+def purge() -> None:
+    """
+    function clears cache of compiled FSMs, parsed patterns and interned parse tree nodes
+    """
+    _pattern_cache.purge()
+    parse.cache_clear()
+    _interned_nodes.clear()
+
+
+def cache_info() -> CacheInfo:
+    """
+    function returns statistics of cache of compiled FSMs
+    """
+    return _pattern_cache.info()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,70 @@
+"""Unit tests for asyncio matching"""
+import asyncio
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from async_matching import check_async, match_stream_async
+from regex import RegexFSM
+
+
+async def _chunks(chunks):
+    for chunk in chunks:
+        yield chunk
+
+
+class TestAsyncMatching(unittest.IsolatedAsyncioTestCase):
+    async def test_async_iterable(self):
+        """Test matching chunks of async iterable"""
+        regex = RegexFSM("[a-c]*4.+hi")
+        self.assertTrue(await match_stream_async(regex, _chunks(["aab", "c4", "uuhi"])))
+        self.assertFalse(await match_stream_async(regex, _chunks(["aab", "c4", "uuh"])))
+        self.assertTrue(await match_stream_async(regex, _chunks([b"ab4", b"xhi"])))
+
+    async def test_stream_reader(self):
+        """Test matching bytes read from stream reader"""
+        regex = RegexFSM("(ab)*c")
+        reader = asyncio.StreamReader()
+        reader.feed_data(b"ab" * 1000)
+        reader.feed_data(b"c")
+        reader.feed_eof()
+        self.assertTrue(await match_stream_async(regex, reader, chunk_size=100))
+
+    async def test_dead_stops_reading(self):
+        """Test source is not read after no state is alive"""
+        read = []
+
+        async def source():
+            for chunk in ["ab", "x", "ab", "ab"]:
+                read.append(chunk)
+                yield chunk
+
+        self.assertFalse(await match_stream_async(RegexFSM("(ab)*"), source()))
+        self.assertEqual(read, ["ab", "x"])
+
+    async def test_yields_to_loop(self):
+        """Test long payload gives control to other tasks while matched"""
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0)
+
+        task = asyncio.create_task(ticker())
+        await asyncio.sleep(0)
+        self.assertTrue(await check_async(RegexFSM("[a-z]*"), "a" * 10000, yield_size=1000))
+        task.cancel()
+        self.assertGreaterEqual(ticks, 10)
+
+    async def test_executor(self):
+        """Test large payloads are matched in executor with the same FSM"""
+        regex = RegexFSM("ab*c", minimize=True)
+        payloads = ["a" + "b" * 1000 + "c", b"a" + b"b" * 1000, "abc", "a" + "b" * 50 + "c"]
+        with ThreadPoolExecutor(2) as executor:
+            results = await asyncio.gather(*(check_async(regex, data, executor, yield_size=10, offload_size=100)
+                                             for data in payloads))
+        self.assertEqual(results, [True, False, True, True])
+
+
+if __name__ == "__main__":
+    unittest.main()
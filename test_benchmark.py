@@ -0,0 +1,69 @@
+"""Unit tests for benchmarks"""
+import io
+import json
+import os
+import random
+import re
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+import regex
+from benchmark import CORPUS, ENGINES, _compile_seconds, compare_results, main, run_benchmarks
+
+
+class TestBenchmark(unittest.TestCase):
+    def test_corpus_inputs_match(self):
+        """Test generated inputs match their patterns"""
+        for case in CORPUS:
+            string = case.make_input(random.Random(1), 500)
+            self.assertGreaterEqual(len(string), 500 - 1)
+            self.assertIsNotNone(re.fullmatch(case.pattern, string), case.name)
+
+    def test_results(self):
+        """Test every case is measured with every engine"""
+        results = run_benchmarks(CORPUS[:2], sizes=(100, 200), repeat=1)
+        self.assertEqual(len(results["results"]), 2 * len(ENGINES))
+        for result in results["results"]:
+            self.assertEqual(set(result["throughput_mb_s"]), {"100", "200"})
+            self.assertGreater(result["peak_memory_bytes"], 0)
+            self.assertGreaterEqual(result["compile_seconds"], 0)
+        json.dumps(results)
+
+    def test_compile_without_parse_cache(self):
+        """Test every compile timing parses the pattern again"""
+        pattern = CORPUS[0].pattern
+        regex.parse(pattern)
+        regex.parse(pattern)
+        _compile_seconds("lazy", pattern, repeat=3)
+        cache_info = regex.parse.cache_info()
+        self.assertEqual((cache_info.hits, cache_info.misses), (0, 1))
+
+    def test_compare(self):
+        """Test slowdowns above threshold are reported"""
+        baseline = {"results": [{"case": "a", "engine": "lazy", "compile_seconds": 1.0,
+                                 "throughput_mb_s": {"100": 10.0}}]}
+        current = {"results": [{"case": "a", "engine": "lazy", "compile_seconds": 1.1,
+                                "throughput_mb_s": {"100": 7.0}},
+                               {"case": "b", "engine": "lazy", "compile_seconds": 1.0,
+                                "throughput_mb_s": {"100": 1.0}}]}
+        regressions = compare_results(baseline, current, threshold=0.2)
+        self.assertEqual(len(regressions), 1)
+        self.assertIn("a/lazy size 100", regressions[0])
+        self.assertEqual(compare_results(baseline, current, threshold=0.5), [])
+
+    def test_cli(self):
+        """Test command line writes JSON and compares with baseline"""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "results.json")
+            args = ["--sizes", "50", "--repeat", "1", "--engines", "lazy", "--cases", "wide_class"]
+            with redirect_stdout(io.StringIO()) as output:
+                self.assertEqual(main(args + ["-o", path]), 0)
+                self.assertEqual(main(args + ["--compare", path, "--threshold", "1000"]), 0)
+            self.assertIn("wide_class", output.getvalue())
+
+            with open(path, encoding="utf-8") as file:
+                self.assertEqual(json.load(file)["results"][0]["engine"], "lazy")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,37 @@
+"""Unit tests for parallel matching"""
+import os
+import tempfile
+import unittest
+from parallel_matching import iter_line_chunks, match_file, match_files, match_lines
+from regex import RegexFSM, RegexSet
+
+
+class TestParallelMatching(unittest.TestCase):
+    def test_line_chunks(self):
+        """Test lines are split into chunks of given size"""
+        self.assertEqual(list(iter_line_chunks(["a", "b", "c"], 2)), [["a", "b"], ["c"]])
+        self.assertEqual(list(iter_line_chunks([], 2)), [])
+
+    def test_match_lines(self):
+        """Test results are merged in order of the lines"""
+        regex = RegexFSM("[a-c]*4.+hi")
+        lines = ["aaaaaa4uhi", "4uhi", "meow", "cab4xxhi", "4hi"] * 50
+        expected = [regex.check_string(line) for line in lines]
+        self.assertEqual(match_lines(regex, lines, max_workers=2, chunk_lines=7), expected)
+
+    def test_match_files(self):
+        """Test matching lines of files in worker processes"""
+        with tempfile.TemporaryDirectory() as directory:
+            paths = []
+            for i, text in enumerate(["abc\nxyz\nabc\n", "a*b\n\nab\r\nb\n"]):
+                paths.append(os.path.join(directory, f"{i}.txt"))
+                with open(paths[-1], "w", encoding="utf-8", newline="") as file:
+                    file.write(text)
+
+            regex_set = RegexSet(["abc", "a*b"])
+            self.assertEqual(match_files(regex_set, paths, max_workers=2), [[1, 3], [3, 4]])
+            self.assertEqual(match_file(regex_set, paths[1], max_workers=2, chunk_lines=1), [3, 4])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,17 @@
 """Unit tests for RegexFSM class"""
+import io
+import mmap
+import os
+import pickle
+import re
+import sys
+import tempfile
+import time
 import unittest
-from regex import RegexFSM
+from unittest import mock
+from concurrent.futures import ThreadPoolExecutor
+import regex as regex_module
+from regex import CharSet, DenseDFA, PatternCache, RegexFSM, RegexSet, ResourceLimits
 
 
 class TestRegexPatterns(unittest.TestCase):
@@ -318,5 +329,1049 @@ class TestRegexPatterns(unittest.TestCase):
         self.assertFalse(regex4.check_string("m"))
 
 
+class TestLazyDFA(unittest.TestCase):
+    def test_dfa_matches_nfa(self):
+        """Test lazy DFA gives the same answers as NFA simulation"""
+        patterns = ["abc", "a*b+c.", "[a-c]*4.+hi", ".*abc", "[^a-m]*z", "a*"]
+        strings = ["", "abc", "bcx", "aabbbcx", "aaaaaa4uhi", "4uhi", "xxabc", "nnz", "az", "aaaa"]
+        for pattern in patterns:
+            nfa = RegexFSM(pattern, dfa_cache_size=0)
+            dfa = RegexFSM(pattern)
+            for string in strings:
+                self.assertEqual(nfa.check_string(string), dfa.check_string(string))
+
+    def test_transitions_are_cached(self):
+        """Test DFA states and transitions are memoized between calls"""
+        regex = RegexFSM("a*b")
+        self.assertTrue(regex.check_string("aaab"))
+        states_count = len(regex.dfa.table.nfa_states)
+        self.assertTrue(regex.check_string("aab"))
+        self.assertEqual(len(regex.dfa.table.nfa_states), states_count)
+        self.assertIn("a", regex.dfa.table.transitions[regex.dfa.table.start])
+
+    def test_cache_overflow_falls_back_to_nfa(self):
+        """Test matching stays correct when DFA cache overflows"""
+        regex = RegexFSM("[a-c]*4.+hi", dfa_cache_size=2)
+        self.assertTrue(regex.check_string("aaaaaa4uhi"))
+        self.assertFalse(regex.check_string("aaaaaa4uh"))
+        self.assertTrue(regex.check_string("4uhi"))
+        self.assertGreater(regex.dfa.evictions, 0)
+        self.assertLessEqual(len(regex.dfa.table.nfa_states), 2)
+
+
+class TestCompiledMachine(unittest.TestCase):
+    def test_flat_arrays(self):
+        """Test closure, transition and accept bitmasks of pattern a*b*c"""
+        regex = RegexFSM("a*b*c")
+        # start -> a -> b by epsilon transitions, c is reached from b only
+        self.assertEqual(regex.closure_masks, [0b0111, 0b0110, 0b0100, 0b1000])
+        self.assertEqual(regex.transition_masks, [0b0000, 0b0010, 0b1100, 0b0000])
+        self.assertEqual(regex.accept_mask, 0b1000)
+        self.assertEqual([state.state_id for state in regex.states], [0, 1, 2, 3])
+
+    def test_states_use_slots(self):
+        """Test states do not carry per-instance dict"""
+        regex = RegexFSM("a.[bc]")
+        for state in regex.states:
+            self.assertFalse(hasattr(state, "__dict__"))
+
+
+class TestMatcher(unittest.TestCase):
+    def test_incremental_matching(self):
+        """Test matcher keeps its own states between advance calls"""
+        regex = RegexFSM("[a-c]*4.+hi")
+        matcher = regex.matcher()
+        matcher.advance("aaa4")
+        self.assertFalse(matcher.is_accepting())
+        self.assertTrue(matcher.advance("uhi").is_accepting())
+
+        # Other matches are not affected by unfinished matcher
+        other = regex.matcher()
+        self.assertFalse(other.is_accepting())
+        self.assertTrue(regex.check_string("4uhi"))
+
+        matcher.reset()
+        self.assertFalse(matcher.is_accepting())
+
+    def test_failed_match_leaves_fsm_clean(self):
+        """Test exception during matching does not affect later matches"""
+        regex = RegexFSM("a+.b")
+        with self.assertRaises(AttributeError):
+            regex.check_string(["a", 1])
+        self.assertTrue(regex.check_string("aaxb"))
+        self.assertFalse(regex.check_string("ab"))
+
+    def test_shared_between_threads(self):
+        """Test one compiled FSM used by many threads at once"""
+        strings = ["aaaaaa4uhi", "4uhi", "meow", "cab4xxhi", "4hi", "ab4zhix"] * 200
+        expected = [RegexFSM("[a-c]*4.+hi", dfa_cache_size=0).check_string(s) for s in strings]
+
+        for cache_size in (3, 1024):
+            regex = RegexFSM("[a-c]*4.+hi", dfa_cache_size=cache_size)
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                self.assertEqual(list(executor.map(regex.check_string, strings)), expected)
+
+
+class TestEarlyExit(unittest.TestCase):
+    def test_dead_state_skips_rest(self):
+        """Test matching stops once no state is alive"""
+        for cache_size in (0, 1024):
+            regex = RegexFSM("ab*c", dfa_cache_size=cache_size)
+            # inputs pass literal prefilter, so the automaton rejects them
+            self.assertFalse(regex.check_string("ax" + "abc" * 100))
+            self.assertFalse(regex.check_string("abbd" + "c" * 10))
+            self.assertEqual(regex.early_exit_stats.early_exits, 2)
+            self.assertEqual(regex.early_exit_stats.skipped_chars, 300 + 10)
+
+            self.assertTrue(regex.check_string("abbc"))
+            self.assertEqual(regex.early_exit_stats.early_exits, 2)
+
+    def test_accepting_sink(self):
+        """Test trailing .* accepts rest of the input without consuming it"""
+        for cache_size in (0, 1024):
+            regex = RegexFSM("ab.*", dfa_cache_size=cache_size)
+            self.assertTrue(regex.check_string("ab"))
+            self.assertTrue(regex.check_string("abxyz" + "q" * 50))
+            self.assertTrue(regex.check_string("abxyzé"))
+            self.assertFalse(regex.check_string("axyz"))
+            self.assertGreater(regex.early_exit_stats.skipped_chars, 50)
+
+            regex = RegexFSM(".*", dfa_cache_size=cache_size)
+            self.assertTrue(regex.check_string(""))
+            self.assertTrue(regex.check_string("any text"))
+            self.assertTrue(regex.check_string("not ascii ж"))
+
+    def test_matcher_after_early_exit(self):
+        """Test matcher stays dead or accepting after early exit"""
+        regex = RegexFSM("ab.*")
+        matcher = regex.matcher().advance("abc")
+        self.assertTrue(matcher.advance("def").is_accepting())
+        self.assertTrue(matcher.advance("ё").is_accepting())
+
+        matcher.reset()
+        self.assertFalse(matcher.advance("x").advance("ab").is_accepting())
+
+
+class TestPatternCache(unittest.TestCase):
+    def setUp(self):
+        regex_module.purge()
+
+    def test_compile_reuses_fsm(self):
+        """Test module level compile returns cached FSM"""
+        info = regex_module.cache_info()
+        regex = regex_module.compile("a*b")
+        self.assertIs(regex_module.compile("a*b"), regex)
+        self.assertIsNot(regex_module.compile("a*b", dfa_cache_size=0), regex)
+        self.assertTrue(regex.check_string("aab"))
+
+        new_info = regex_module.cache_info()
+        self.assertEqual(new_info.hits - info.hits, 1)
+        self.assertEqual(new_info.misses - info.misses, 2)
+        self.assertEqual(new_info.currsize, 2)
+
+    def test_purge(self):
+        """Test purge drops compiled FSMs"""
+        regex = regex_module.compile("abc")
+        regex_module.purge()
+        self.assertEqual(regex_module.cache_info().currsize, 0)
+        self.assertIsNot(regex_module.compile("abc"), regex)
+
+    def test_lru_eviction(self):
+        """Test least recently used pattern is evicted first"""
+        cache = PatternCache(maxsize=2)
+        first = cache.get("a")
+        cache.get("b")
+        self.assertIs(cache.get("a"), first)
+        cache.get("c")
+        self.assertIs(cache.get("a"), first)
+        self.assertEqual(cache.info().currsize, 2)
+        self.assertEqual(cache.info().misses, 3)
+
+    def test_dfa_states_limit(self):
+        """Test cached DFA tables count towards cache size"""
+        cache = PatternCache(maxsize=10, max_dfa_states=8)
+        regex = cache.get("[a-c]*4.+hi")
+        regex.check_string("aaaaaa4uhi")
+        regex.check_string("4uuuh")
+        self.assertGreater(regex.dfa_size(), 4)
+
+        cache.get("x")
+        cache.get("y")
+        info = cache.info()
+        self.assertEqual(info.currsize, 2)
+        self.assertLessEqual(info.dfa_states, 8)
+        self.assertIsNot(cache.get("[a-c]*4.+hi"), regex)
+
+    def test_dfa_growth_after_insertion(self):
+        """Test DFA states added by cached FSMs are measured on hits and statistics"""
+        cache = PatternCache(maxsize=10, max_dfa_states=8)
+        other = cache.get("x")
+        regex = cache.get("[a-c]*4.+hi")
+        regex.check_string("aaaaaa4uhi")
+        regex.check_string("4uuuh")
+        self.assertEqual(cache.info().dfa_states, other.dfa_size() + regex.dfa_size())
+
+        self.assertIs(cache.get("x"), other)
+        info = cache.info()
+        self.assertEqual(info.currsize, 1)
+        self.assertEqual(info.dfa_states, other.dfa_size())
+
+
+class TestRegexSet(unittest.TestCase):
+    def test_matched_patterns(self):
+        """Test set reports every pattern accepting the string"""
+        patterns = ["abc", "a*b", ".*c", "[0-9]+", "ab.*"]
+        for cache_size in (0, 1024):
+            regex_set = RegexSet(patterns, dfa_cache_size=cache_size)
+            self.assertEqual(regex_set.matches("abc"), [0, 2, 4])
+            self.assertEqual(regex_set.matches("aab"), [1])
+            self.assertEqual(regex_set.matches("ab"), [1, 4])
+            self.assertEqual(regex_set.matches("123"), [3])
+            self.assertEqual(regex_set.matches("xyz"), [])
+            self.assertEqual(regex_set.matches(""), [])
+
+    def test_same_as_separate_patterns(self):
+        """Test set gives the same answers as separately compiled patterns"""
+        patterns = ["[a-c]*4.+hi", "a*b+c.", "[^a-m]*z", "a.*z", "[0-9][a-z][0-9]"]
+        strings = ["aaaaaa4uhi", "4uhi", "bcx", "aabbbcx", "nnz", "abcz", "5a7", "meow", ""]
+        regex_set = RegexSet(patterns)
+        for string in strings:
+            expected = [i for i, pattern in enumerate(patterns) if RegexFSM(pattern).check_string(string)]
+            self.assertEqual(regex_set.matches(string), expected)
+            self.assertEqual(regex_set.check_string(string), bool(expected))
+
+
+class TestSearch(unittest.TestCase):
+    def test_search(self):
+        """Test search finds leftmost-longest match anywhere in the string"""
+        regex = RegexFSM("a+b")
+        match = regex.search("xxaaabyab")
+        self.assertEqual(match.span(), (2, 6))
+        self.assertEqual(match.group(), "aaab")
+        self.assertEqual(regex.search("xxaaabyab", 3).span(), (3, 6))
+        self.assertEqual(regex.search("xxaaabyab", 6).span(), (7, 9))
+        self.assertIsNone(regex.search("xxaaa"))
+
+        # Longest match for the leftmost start
+        self.assertEqual(RegexFSM("a.*b").search("xaybzbq").span(), (1, 6))
+        self.assertEqual(RegexFSM("ab*").search("cabbbd").group(), "abbb")
+
+    def test_findall_like_re(self):
+        """Test findall and finditer agree with re module"""
+        cases = [
+            ("a+b", "xxaaabyabab"),
+            ("[0-9]+", "a1b22c333"),
+            ("a*", "baaca"),
+            ("[^ ]+", "split these  words"),
+            (".c", "abcbc"),
+            ("x*", ""),
+        ]
+        for pattern, string in cases:
+            regex = RegexFSM(pattern)
+            self.assertEqual(regex.findall(string), re.findall(pattern, string))
+            self.assertEqual([match.span() for match in regex.finditer(string)],
+                             [match.span() for match in re.finditer(pattern, string)])
+
+
+    def test_findall_time_is_linear(self):
+        """Test matches which could be extended to the end do not make findall rescan the string"""
+        regex = RegexFSM("a|a.*b")
+
+        def findall_seconds(length: int) -> float:
+            string = "a" * length
+            start = time.perf_counter()
+            self.assertEqual(len(regex.findall(string)), length)
+            return time.perf_counter() - start
+
+        short = min(findall_seconds(2000) for _ in range(3))
+        long = min(findall_seconds(16000) for _ in range(3))
+        # quadratic scan would be 64 times slower
+        self.assertLess(long, short * 24)
+
+    def test_search_jumps_to_literal_prefix(self):
+        """Test search looks for matches only where literal prefix occurs"""
+        regex = RegexFSM("needle[0-9]*")
+        string = "x" * 1000000 + "needle12"
+        with mock.patch.object(RegexFSM, "move", autospec=True, side_effect=RegexFSM.move) as move:
+            self.assertEqual(regex.search(string).span(), (1000000, 1000008))
+        self.assertLess(move.call_count, 20)
+        self.assertEqual(regex.findall("needle1 needl needle"), ["needle1", "needle"])
+
+
+class TestStreaming(unittest.TestCase):
+    def test_feed_and_finish(self):
+        """Test matcher reports acceptance at chunk boundaries"""
+        matcher = RegexFSM("[a-c]*4.+hi").matcher()
+        self.assertFalse(matcher.feed("abc"))
+        self.assertFalse(matcher.feed("a4x"))
+        self.assertTrue(matcher.feed("hi"))
+        self.assertFalse(matcher.feed("x"))
+        self.assertFalse(matcher.finish())
+
+        # Matcher is ready for next input after finish
+        for chunk in ("4", "u", "h", "i"):
+            matcher.feed(chunk)
+        self.assertTrue(matcher.finish())
+
+    def test_match_stream(self):
+        """Test matching iterables of chunks and text files"""
+        regex = RegexFSM("a+b.*z")
+        self.assertTrue(regex.match_stream(iter(["aa", "ab", "xyz"])))
+        self.assertFalse(regex.match_stream(["aa", "ab", "xy"]))
+        self.assertTrue(regex.match_stream(io.StringIO("a" * 1000 + "b" + "c" * 1000 + "z"), chunk_size=64))
+        self.assertFalse(regex.match_stream(io.StringIO(""), chunk_size=64))
+
+    def test_stream_stops_when_dead(self):
+        """Test source is not read after no state is alive"""
+        def chunks():
+            yield "ab"
+            yield "x"
+            raise AssertionError("stream was read after match failed")
+
+        self.assertFalse(RegexFSM("abc").match_stream(chunks()))
+
+
+class TestBytes(unittest.TestCase):
+    def test_bytes_like_inputs(self):
+        """Test bytes, bytearray and memoryview give the same answers as str"""
+        patterns = ["[a-c]*4.+hi", "a*b+c.", "[^a-m]*z", "ab.*", "[0-9][a-z][0-9]"]
+        strings = ["aaaaaa4uhi", "4uhi", "aabbbcx", "nnz", "abxyz", "5a7", "meow", ""]
+        for cache_size in (0, 3, 1024):
+            for pattern in patterns:
+                regex = RegexFSM(pattern, dfa_cache_size=cache_size)
+                for string in strings:
+                    data = string.encode()
+                    expected = regex.check_string(string)
+                    self.assertEqual(regex.check_bytes(data), expected)
+                    self.assertEqual(regex.check_bytes(bytearray(data)), expected)
+                    self.assertEqual(regex.check_bytes(memoryview(data)), expected)
+
+    def test_non_ascii_bytes(self):
+        """Test bytes outside ascii are characters with the same code (latin-1)"""
+        regex = RegexFSM("a.*")
+        self.assertTrue(regex.check_bytes(b"abc"))
+        self.assertTrue(regex.check_bytes(b"ab\xff"))
+        self.assertTrue(RegexFSM("[^a]").check_bytes(b"\x80"))
+        self.assertTrue(RegexFSM("é+").check_bytes("éé".encode("latin-1")))
+        self.assertFalse(RegexFSM("é+").check_bytes("éé".encode()))
+        self.assertFalse(RegexFSM("a*ж").check_bytes("aж".encode()))
+
+    def test_mmap(self):
+        """Test matching memory-mapped file"""
+        regex = RegexFSM("x*[0-9]+y")
+        with tempfile.TemporaryFile() as file:
+            file.write(b"x" * 100000 + b"1234567890" * 10000 + b"y")
+            file.flush()
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                self.assertTrue(regex.check_bytes(mapped))
+                self.assertFalse(RegexFSM("x*y").check_bytes(mapped))
+
+
+class TestMatchMany(unittest.TestCase):
+    def test_same_as_check_string(self):
+        """Test batch matching gives the same answers as matching one by one"""
+        strings = ["aaaaaa4uhi", "4uhi", "meow", "", "cab4xxhi", "4hi", "ab4zhix", "4éhi", "b4" + "x" * 50 + "hi"]
+        for pattern in ("[a-c]*4.+hi", "ab.*", "[^a-m]*"):
+            for cache_size in (0, 4, 1024):
+                regex = RegexFSM(pattern, dfa_cache_size=cache_size)
+                expected = [regex.check_string(string) for string in strings]
+                self.assertEqual([bool(result) for result in regex.match_many(strings)], expected)
+
+    def test_dead_strings_leave_batch(self):
+        """Test strings stop being stepped once they are rejected and DFA grows only by reached bytes"""
+        regex = RegexFSM("[a-c]*[0-9]+[a-z]*")
+        strings = ["x" + "a" * 300, "ab12" + "z" * 200, "c" * 50, "", "a1", "q" * 400]
+        self.assertEqual(list(regex.match_many(strings)), [False, True, False, False, True, False])
+        table = regex.dfa.table
+        self.assertIs(table.byte_transitions[regex_module.DEAD_STATE], regex_module.UNKNOWN_BYTE_ROW)
+        known_bytes = [byte for byte, state in enumerate(table.byte_transitions[table.start])
+                       if state != regex_module.UNKNOWN_STATE]
+        self.assertEqual(known_bytes, [ord(char) for char in "acqx"])
+
+    def test_empty_batch(self):
+        """Test matching empty batch"""
+        self.assertEqual(len(RegexFSM("a").match_many([])), 0)
+
+    @unittest.skipIf(regex_module.np is None, "NumPy is not installed")
+    def test_array_without_dfa(self):
+        """Test boolean array is returned when FSM simulates the NFA"""
+        for regex in (RegexFSM("a+b", dfa_cache_size=0), RegexFSM("a+b", limits=ResourceLimits(max_dfa_states=0))):
+            self.assertIsNone(regex.dfa)
+            results = regex.match_many(["ab", "b", "aab"])
+            self.assertIsInstance(results, regex_module.np.ndarray)
+            self.assertEqual(results.dtype, bool)
+            self.assertEqual(results.tolist(), [True, False, True])
+        self.assertEqual(RegexFSM("a", dfa_cache_size=0).match_many([]).shape, (0,))
+
+    def test_without_numpy(self):
+        """Test list of booleans is returned when NumPy is not installed"""
+        with mock.patch.object(regex_module, "np", None):
+            self.assertEqual(RegexFSM("a+b").match_many(["ab", "b", "aab"]), [True, False, True])
+
+
+class TestPickle(unittest.TestCase):
+    def test_pickled_fsm_is_compact(self):
+        """Test FSM is pickled by pattern and compiled again"""
+        regex = RegexFSM("[a-c]*4.+hi", dfa_cache_size=16)
+        regex.check_string("aaaaaa4uhi")
+        data = pickle.dumps(regex)
+        self.assertLess(len(data), 200)
+
+        copy = pickle.loads(data)
+        self.assertEqual(copy.pattern, regex.pattern)
+        self.assertEqual(copy.dfa_cache_size, 16)
+        self.assertTrue(copy.check_string("4uhi"))
+
+        regex_set = pickle.loads(pickle.dumps(RegexSet(["abc", "a*b"], dfa_cache_size=0)))
+        self.assertEqual(regex_set.matches("ab"), [1])
+        self.assertIsNone(regex_set.dfa)
+
+
+class TestMinimizedDFA(unittest.TestCase):
+    def test_same_as_lazy_dfa(self):
+        """Test minimized DFA gives the same answers as lazy DFA"""
+        patterns = ["abc", "a*b+c.", "[a-c]*4.+hi", ".*abc", "[^a-m]*z", "a*", "ab.*", ".*", ""]
+        strings = ["", "abc", "bcx", "aabbbcx", "aaaaaa4uhi", "4uhi", "xxabc", "nnz", "az", "aaaa", "abé", "ab\x7f"]
+        for pattern in patterns:
+            lazy = RegexFSM(pattern)
+            minimized = RegexFSM(pattern, minimize=True)
+            self.assertIsNotNone(minimized.dense_dfa)
+            for string in strings:
+                self.assertEqual(minimized.check_string(string), lazy.check_string(string))
+                self.assertEqual(minimized.check_bytes(string.encode()), lazy.check_bytes(string.encode()))
+
+    def test_state_count_is_minimal(self):
+        """Test equivalent states are merged"""
+        # states: before b, after b and dead
+        dfa = RegexFSM("a*a*a*b", minimize=True).dense_dfa
+        self.assertEqual(dfa.state_count, 3)
+        # classes: a, b and everything else
+        self.assertEqual(dfa.class_count, 3)
+
+        dfa = RegexFSM("[a-zA-Z0-9]+[a-zA-Z0-9]*", minimize=True).dense_dfa
+        self.assertEqual(dfa.state_count, 3)
+        self.assertEqual(dfa.class_count, 2)
+
+    def test_too_many_states(self):
+        """Test lazy DFA is used when minimized DFA does not fit"""
+        regex = RegexFSM("[a-c]*4.+hi", dfa_cache_size=3, minimize=True)
+        self.assertIsNone(regex.dense_dfa)
+        self.assertTrue(regex.check_string("aaaaaa4uhi"))
+
+
+class TestDFAFile(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "pattern.dfa")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_save_and_load(self):
+        """Test loaded DFA gives the same answers as compiled FSM"""
+        strings = ["aaaaaa4uhi", "4uhi", "meow", "", "cab4xxhi", "4hi", "4éhi"]
+        for pattern in ("[a-c]*4.+hi", "ab.*", ""):
+            regex = RegexFSM(pattern)
+            regex.save_dfa(self.path)
+            dfa = DenseDFA.load(self.path, pattern)
+            self.assertIsInstance(dfa.transitions, memoryview)
+            for string in strings:
+                self.assertEqual(dfa.check_string(string), regex.check_string(string))
+                self.assertEqual(dfa.check_bytes(string.encode()), regex.check_bytes(string.encode()))
+
+    def test_pattern_set(self):
+        """Test saving DFA of pattern set"""
+        patterns = ["abc", "a*b"]
+        RegexSet(patterns, minimize=True).save_dfa(self.path)
+        dfa = DenseDFA.load(self.path, patterns)
+        self.assertTrue(dfa.check_string("aab"))
+        self.assertFalse(dfa.check_string("ac"))
+
+    def test_validation(self):
+        """Test files saved for other pattern, version or damaged files are rejected"""
+        RegexFSM("a+b").save_dfa(self.path)
+        DenseDFA.load(self.path)
+        with self.assertRaises(ValueError):
+            DenseDFA.load(self.path, "a*b")
+        with self.assertRaises(ValueError):
+            DenseDFA.load(self.path, ["a+b"])
+
+        with open(self.path, "rb") as file:
+            data = file.read()
+        header_size = regex_module.DFA_FILE_HEADER.size
+        bad_start = data[:20] + (999).to_bytes(4, "little") + data[24:]
+        bad_class = data[:header_size] + b"\xff" + data[header_size+1:]
+        bad_transition = data[:-4] + b"\xff\xff\xff\xff"
+        for damaged in (b"", b"XXXX" + data[4:], data[:4] + b"\x09\x00" + data[6:], data[:-1],
+                        bad_start, bad_class, bad_transition):
+            with open(self.path, "wb") as file:
+                file.write(damaged)
+            with self.assertRaises(ValueError):
+                DenseDFA.load(self.path, "a+b")
+
+
+class TestPrefilter(unittest.TestCase):
+    def test_extracted_literals(self):
+        """Test literal prefix, suffix and required substring of patterns"""
+        regex = RegexFSM("hello.*world[0-9]+end")
+        self.assertEqual(regex.literal_prefix, "hello")
+        self.assertEqual(regex.literal_suffix, "end")
+        self.assertEqual(regex.required_literal, "world")
+
+        regex = RegexFSM("[a-c]*4.+hi")
+        self.assertEqual((regex.literal_prefix, regex.literal_suffix), ("", "hi"))
+
+        # b+ repeats, so every accepted string starts with ab and ends with bc
+        regex = RegexFSM("ab+c")
+        self.assertEqual((regex.literal_prefix, regex.literal_suffix), ("ab", "bc"))
+
+        # b* may be skipped, b is not required
+        regex = RegexFSM("ab*c")
+        self.assertEqual((regex.literal_prefix, regex.literal_suffix, regex.required_literal), ("a", "c", ""))
+
+        regex = RegexFSM(".*")
+        self.assertFalse(regex.has_literals)
+
+    def test_prefilter(self):
+        """Test prefilter rejects only strings without required literals"""
+        regex = RegexFSM("[ab]cd+ef")
+        self.assertTrue(regex.prefilter("acdddef"))
+        self.assertTrue(regex.prefilter("xcdxdef"))
+        self.assertFalse(regex.prefilter("acddde"))
+        self.assertFalse(regex.prefilter(b"acxdef"))
+        self.assertTrue(regex.prefilter(bytearray(b"bcddef")))
+
+    def test_results_unchanged(self):
+        """Test matching with prefilter agrees with re module"""
+        patterns = ["ab+c", "ab*c", "x.*yz+", "[0-9]+abc[^x]*", "hello.*world[0-9]+end", "a*b+c."]
+        strings = ["", "abc", "abbbc", "ac", "xyz", "xqqyzz", "12abcq", "12abcx", "abbcd",
+                   "hello world1end", "helloworldend", "bcx", "aab"]
+        for pattern in patterns:
+            regex = RegexFSM(pattern, minimize=pattern.startswith("x"))
+            expected = [re.fullmatch(pattern, string) is not None for string in strings]
+            self.assertEqual([regex.check_string(string) for string in strings], expected)
+            self.assertEqual([regex.check_bytes(string.encode()) for string in strings], expected)
+            self.assertEqual(list(regex.match_many(strings)), expected)
+
+    def test_search_without_literal(self):
+        """Test search skips strings that miss required literal"""
+        regex = RegexFSM("ab+c")
+        self.assertIsNone(regex.search("abbbbd" * 10))
+        self.assertEqual(regex.findall("xx abbc abc ac"), ["abbc", "abc"])
+        self.assertEqual(regex.findall("no match"), [])
+
+
+class TestGrammar(unittest.TestCase):
+    def test_optional(self):
+        """Test "?" operator"""
+        regex = RegexFSM("ab?c")
+        self.assertTrue(regex.check_string("ac"))
+        self.assertTrue(regex.check_string("abc"))
+        self.assertFalse(regex.check_string("abbc"))
+
+    def test_counted_repetition(self):
+        """Test {m}, {m,}, {,n} and {m,n} operators"""
+        regex = RegexFSM("a{3}")
+        self.assertTrue(regex.check_string("aaa"))
+        self.assertFalse(regex.check_string("aa"))
+        self.assertFalse(regex.check_string("aaaa"))
+
+        regex = RegexFSM("x[0-9]{2,4}y")
+        self.assertFalse(regex.check_string("x1y"))
+        self.assertTrue(regex.check_string("x12y"))
+        self.assertTrue(regex.check_string("x1234y"))
+        self.assertFalse(regex.check_string("x12345y"))
+
+        regex = RegexFSM("a{2,}b{,1}")
+        self.assertTrue(regex.check_string("aaaaab"))
+        self.assertFalse(regex.check_string("ab"))
+        self.assertFalse(regex.check_string("aabb"))
+
+        # braces without count are literal
+        self.assertTrue(RegexFSM("a{x}").check_string("a{x}"))
+
+    def test_alternation_and_groups(self):
+        """Test "|" operator and groups"""
+        regex = RegexFSM("(ab|cd)+e|f")
+        self.assertTrue(regex.check_string("abcdabe"))
+        self.assertTrue(regex.check_string("f"))
+        self.assertFalse(regex.check_string("abf"))
+        self.assertFalse(regex.check_string("e"))
+
+        regex = RegexFSM("x(?:a|bc){1,3}y")
+        self.assertTrue(regex.check_string("xabcay"))
+        self.assertFalse(regex.check_string("xy"))
+        self.assertFalse(regex.check_string("xaaaay"))
+
+        self.assertTrue(RegexFSM("(a|)b").check_string("b"))
+        self.assertTrue(RegexFSM("").check_string(""))
+        self.assertEqual(RegexSet(["a|b", "(c)+", ""]).matches("c"), [1])
+
+    def test_escapes(self):
+        """Test escaped special characters"""
+        regex = RegexFSM(r"a\.b\*[\]x]")
+        self.assertTrue(regex.check_string("a.b*]"))
+        self.assertFalse(regex.check_string("axb*]"))
+
+    def test_letter_escapes(self):
+        """Test control escapes match like in re and other escaped letters and digits are refused"""
+        regex = RegexFSM(r"a\tb[\n\r]+\\")
+        self.assertTrue(regex.check_string("a\tb\r\n\\"))
+        self.assertFalse(regex.check_string("atbn\\"))
+        for pattern in (r"\d", r"\w+", r"[\s]", r"a\1", r"\b"):
+            with self.assertRaises(AttributeError):
+                RegexFSM(pattern)
+
+    def test_same_as_re(self):
+        """Test new operators agree with re module in every matching mode"""
+        patterns = ["(ab|cd)*e", "a{0,3}b{2,}", "(a*)*b", ".*(ab|ba)", "((a|b)c){2}d", "(a+|b)*c?"]
+        strings = ["", "e", "abcde", "bb", "aaabbb", "aaaabb", "aab", "xab", "acbcd", "ababc", "ba"]
+        for pattern in patterns:
+            for regex in (RegexFSM(pattern), RegexFSM(pattern, dfa_cache_size=0),
+                          RegexFSM(pattern, minimize=True)):
+                for string in strings:
+                    self.assertEqual(regex.check_string(string), re.fullmatch(pattern, string) is not None)
+
+    def test_counted_repetition_width(self):
+        """Test optional copies of counted repetition are not active all at once"""
+        regex = RegexFSM("a{0,1000}")
+        matcher = regex.matcher().advance("a" * 500)
+        self.assertEqual(bin(matcher.nfa_states()).count("1"), 2)
+        self.assertTrue(matcher.is_accepting())
+        self.assertFalse(regex.check_string("a" * 1001))
+
+    def test_syntax_errors(self):
+        """Test malformed patterns are rejected"""
+        for pattern in ("*a", "(a", "a)", "a{3,1}", "a\\"):
+            with self.assertRaises(AttributeError):
+                RegexFSM(pattern)
+
+
+class TestCharSet(unittest.TestCase):
+    def test_ranges(self):
+        """Test ranges are sorted and merged"""
+        chars = CharSet([(ord("x"), ord("z")), (ord("a"), ord("c")), (ord("b"), ord("f")), (ord("g"), ord("g"))])
+        self.assertEqual(chars.ranges, ((ord("a"), ord("g")), (ord("x"), ord("z"))))
+        self.assertEqual(len(chars), 10)
+        self.assertIn("d", chars)
+        self.assertNotIn("h", chars)
+        self.assertEqual(CharSet.of("cab"), CharSet([(ord("a"), ord("c"))]))
+
+    def test_wide_range(self):
+        """Test wide range is not expanded into single characters"""
+        chars = CharSet([(0x20, 0x10FFFF)])
+        self.assertEqual(len(chars.ranges), 1)
+        self.assertIn("ж", chars)
+        self.assertTrue(chars.contains_code(0x10FFFF))
+        self.assertFalse(chars.contains_code(0x1F))
+
+    def test_operations(self):
+        """Test union, intersection, difference and subset"""
+        letters = CharSet([(ord("a"), ord("z"))])
+        vowels = CharSet.of("aeiou")
+        self.assertEqual(letters & vowels, vowels)
+        self.assertEqual(len(letters - vowels), 21)
+        self.assertEqual(vowels | CharSet.of("xy"), CharSet.of("aeiouxy"))
+        self.assertTrue(vowels <= letters)
+        self.assertFalse(letters <= vowels)
+        self.assertFalse(CharSet.of("ab") & CharSet.of("cd"))
+
+    def test_char_class_state(self):
+        """Test character classes are stored as ranges"""
+        regex = RegexFSM("[a-z0-9_]+[^a-z]")
+        char_class = regex.states[1]
+        self.assertEqual(len(char_class.chars.ranges), 3)
+        self.assertTrue(regex.check_string("ab_9Z"))
+        self.assertFalse(regex.check_string("ab_9z"))
+        self.assertTrue(regex.check_string("ab_9ж"))
+
+
+class TestInstrumentation(unittest.TestCase):
+    def test_disabled_by_default(self):
+        """Test no counters are collected unless enabled"""
+        regex = RegexFSM("ab*c")
+        self.assertIsNone(regex.match_stats)
+        self.assertTrue(regex.check_string("abbc"))
+        self.assertEqual(set(regex.compile_seconds), {"parse", "flatten", "literals"})
+
+    def test_counters(self):
+        """Test counters of characters, active states and DFA cache"""
+        regex = RegexFSM("a{0,3}b|ab")
+        stats = regex.enable_instrumentation()
+        self.assertTrue(regex.check_string("ab"))
+        self.assertTrue(regex.check_string("ab"))
+        self.assertFalse(regex.check_bytes(b"aaaab"))
+
+        self.assertEqual(stats.matches, 3)
+        self.assertEqual(stats.chars_consumed, 2 + 2 + 4)
+        # a of first branch with its exit state and a of second branch
+        self.assertEqual(stats.peak_active_states, 3)
+        self.assertEqual(stats.dfa_hits + stats.dfa_misses, stats.chars_consumed)
+        # second match reuses transitions cached by the first one
+        self.assertGreaterEqual(stats.dfa_hits, 2)
+        self.assertGreater(stats.average_active_states, 1)
+
+        regex.check_string("ax")
+        self.assertEqual(stats.prefilter_rejections, 1)
+
+    def test_nfa_and_evictions(self):
+        """Test closure computations of NFA simulation and DFA cache evictions"""
+        regex = RegexFSM("[ab]*c", dfa_cache_size=0)
+        stats = regex.enable_instrumentation()
+        self.assertTrue(regex.check_string("abac"))
+        self.assertEqual(stats.closure_computations, 4)
+        self.assertEqual(stats.dfa_hits, 0)
+
+        regex = RegexFSM("(a|b)*a(a|b)(a|b)", dfa_cache_size=3)
+        stats = regex.enable_instrumentation()
+        self.assertTrue(regex.check_string("abababbaab"))
+        self.assertGreater(stats.dfa_evictions, 0)
+
+    def test_hooks(self):
+        """Test hooks receive counters of every finished match"""
+        regex = RegexFSM("ab.*")
+        exported = []
+        regex.enable_instrumentation(lambda counters: exported.append(counters.as_dict()))
+        matcher = regex.matcher()
+        self.assertTrue(matcher.advance("ab").advance("cdef").finish())
+        self.assertTrue(regex.match_stream(["ab", "xyz"]))
+        self.assertEqual(len(exported), 2)
+        self.assertEqual(exported[0]["chars_consumed"], 2)
+
+        stats = regex.disable_instrumentation()
+        self.assertTrue(regex.check_string("abc"))
+        self.assertEqual(stats.matches, 2)
+        self.assertIn("minimize", RegexFSM("ab", minimize=True).compile_seconds)
+
+    def test_regex_set_matches(self):
+        """Test matches of pattern set are recorded and passed to hooks"""
+        regex_set = RegexSet(["abc", "a*b", ".*c"])
+        exported = []
+        stats = regex_set.enable_instrumentation(exported.append)
+        self.assertEqual(regex_set.matches("abc"), [0, 2])
+        self.assertEqual(regex_set.matches("aab"), [1])
+        self.assertEqual(stats.matches, 2)
+        self.assertEqual([counters.chars_consumed for counters in exported], [3, 3])
+
+    def test_same_results(self):
+        """Test instrumentation does not change results"""
+        strings = ["", "ab", "abbbc", "abc", "x" * 10, "abcab", "aab"]
+        for options in ({}, {"dfa_cache_size": 0}, {"minimize": True}):
+            regex = RegexFSM("(ab|a)b*c?", **options)
+            expected = [regex.check_string(string) for string in strings]
+            regex.enable_instrumentation()
+            self.assertEqual([regex.check_string(string) for string in strings], expected)
+            self.assertEqual([regex.check_bytes(string.encode()) for string in strings], expected)
+
+
+class TestGraphWalk(unittest.TestCase):
+    def test_walk_states(self):
+        """Test every reachable state is walked once"""
+        regex = RegexFSM("(a|b)*c+")
+        states = list(regex_module.walk_states(regex.start_state))
+        self.assertEqual(len(states), len(set(states)))
+        self.assertEqual(sorted(state.state_id for state in states), list(range(len(regex.states))))
+
+    def test_closure_masks(self):
+        """Test closures of epsilon cycles match closures of single states"""
+        for pattern in ("(a*)*b", "((a?)*b?)*c", "a{0,5}(b|c?)*", "(|a)*"):
+            regex = RegexFSM(pattern)
+            for state in regex.states:
+                closure_mask = sum(1 << closure_state.state_id for closure_state in state.epsilon_closure())
+                self.assertEqual(regex.closure_masks[state.state_id], closure_mask)
+
+    def test_large_pattern(self):
+        """Test pattern with thousands of atoms compiles under low recursion limit"""
+        recursion_limit = sys.getrecursionlimit()
+        sys.setrecursionlimit(200)
+        try:
+            regex = RegexFSM("a?" * 3000 + "b", dfa_cache_size=0)
+            self.assertTrue(regex.states[-1].epsilon_closure())
+        finally:
+            sys.setrecursionlimit(recursion_limit)
+
+        self.assertTrue(regex.check_string("aaab"))
+        self.assertFalse(regex.check_string("aaac"))
+
+    def test_state_equality(self):
+        """Test states are compared by id"""
+        state = regex_module.AsciiState(3, "a")
+        self.assertEqual(state, regex_module.DotState(3))
+        self.assertNotEqual(state, regex_module.AsciiState(4, "a"))
+        self.assertEqual(len({state, regex_module.AsciiState(3, "b")}), 1)
+        self.assertNotEqual(state, 3)
+
+
+class TestShiftAnd(unittest.TestCase):
+    def test_selected_for_linear_patterns(self):
+        """Test Shift-And is used only for linear chains of states"""
+        self.assertIsNotNone(RegexFSM("[a-c]*4.+hi").shift_and)
+        self.assertIsNotNone(RegexFSM("a{3}b*").shift_and)
+        for pattern in ("a?b", "(ab)*", "a|b", "a" * 100):
+            self.assertIsNone(RegexFSM(pattern).shift_and)
+
+    def test_masks(self):
+        """Test masks of adjacent runs of optional states"""
+        masks = RegexFSM("a.*b*c+").shift_and
+        self.assertEqual(masks.forward, 0b10010)
+        self.assertEqual(masks.loop, 0b11100)
+        self.assertEqual(masks.optional, 0b1110)
+        self.assertEqual((masks.first, masks.last), (0b10, 0b1000))
+
+    def test_same_as_state_loops(self):
+        """Test bit-parallel step gives the same states as loops over states"""
+        patterns = ["[ab]+a[^a]+[ab].*[ab]+.*", "a*b*.*c", "x.+y*z+", ".*a.*b"]
+        strings = ["", "bbaaba", "abc", "xyyzz", "xqz", "aab", "ccaxb", "abab"]
+        for pattern in patterns:
+            regex = RegexFSM(pattern, dfa_cache_size=0)
+            loops = RegexFSM(pattern, dfa_cache_size=0)
+            loops.shift_and = None
+            for string in strings:
+                self.assertEqual(regex.check_string(string), re.fullmatch(pattern, string) is not None)
+                self.assertEqual(regex.check_string(string), loops.check_string(string))
+                self.assertEqual(regex.matcher().advance(string).nfa_states(),
+                                 loops.matcher().advance(string).nfa_states())
+
+
+class TestUnicode(unittest.TestCase):
+    def test_same_as_re(self):
+        """Test non-ascii patterns and inputs give the same answers as re in every engine"""
+        patterns = ["жук+", "[а-яё]+ мир", "[^а-я]+", ".*日本.*", "(é|ü)*[\u4e00-\u9fff]{2}", "a.c", "[^ab]*😀"]
+        strings = ["", "жукк", "жук", "ёж мир", "hello", "hello мир", "x日本y", "日本", "éü中文", "中文",
+                   "a😀c", "aжc", "a\nc", "cd😀", "ab😀", "😀", "ǅ"]
+        for pattern in patterns:
+            engines = [RegexFSM(pattern, dfa_cache_size=0), RegexFSM(pattern), RegexFSM(pattern, minimize=True)]
+            self.assertIsNotNone(engines[2].dense_dfa)
+            for string in strings:
+                expected = re.fullmatch(pattern, string, re.DOTALL) is not None
+                for regex in engines:
+                    self.assertEqual(regex.check_string(string), expected, (pattern, string))
+
+    def test_code_ranges(self):
+        """Test wide classes are split into a few code ranges instead of single characters"""
+        regex = RegexFSM("[\u0400-\u04ff]+.[^\u4e00-\u9fff]", minimize=True)
+        self.assertEqual(regex.range_starts, [0x100, 0x400, 0x500, 0x4e00, 0xa000])
+        # Cyrillic, CJK and all the rest
+        self.assertEqual(len(set(regex.range_masks)), 3)
+        dfa = regex.dense_dfa
+        self.assertEqual(list(dfa.range_starts), regex.range_starts)
+        self.assertLessEqual(dfa.class_count, 5)
+        self.assertTrue(regex.check_string("жж" * 1000 + "中a"))
+        self.assertFalse(regex.check_string("жж" * 1000 + "a中"))
+
+    def test_memoized_code_classes(self):
+        """Test minimized DFA memoizes classes of a bounded number of code points"""
+        dfa = RegexFSM(".*[\u4e00-\u9fff]", minimize=True).dense_dfa
+        string = "".join(map(chr, range(0x4e00, 0x4e00 + 100)))
+        with mock.patch.object(regex_module, "MAX_MEMOIZED_CODES", 10):
+            self.assertTrue(dfa.check_string(string))
+        self.assertEqual(len(dfa.code_classes), 10)
+        self.assertTrue(dfa.check_string(string))
+
+    def test_saved_code_ranges(self):
+        """Test code ranges of minimized DFA are saved to file"""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "pattern.dfa")
+            RegexFSM("[а-я]+[^ж]").save_dfa(path)
+            dfa = DenseDFA.load(path, "[а-я]+[^ж]")
+            self.assertIsInstance(dfa.range_starts, memoryview)
+            self.assertTrue(dfa.check_string("мир😀"))
+            self.assertFalse(dfa.check_string("мирж"))
+            self.assertFalse(dfa.check_string("mir!"))
+
+    def test_bytes_prefilter(self):
+        """Test bytes cannot contain literal characters above 255"""
+        regex = RegexFSM("a.*ж.*")
+        self.assertTrue(regex.has_literals)
+        self.assertFalse(regex.check_bytes("aж".encode()))
+        self.assertTrue(regex.check_string("aж"))
+
+
+class TestResourceLimits(unittest.TestCase):
+    def test_nfa_states_counted_before_building(self):
+        """Test NFA state limit is checked with exact state count before states are created"""
+        patterns = ["", "abc", "a*b+c?", "(ab|c)*d", "a{2,5}", "(ab){3,}", "(a|bc){0,2}x", "a{0}b", "(?:a+|b)+"]
+        for pattern in patterns:
+            state_count = len(RegexFSM(pattern).states)
+            RegexFSM(pattern, limits=ResourceLimits(max_nfa_states=state_count))
+            with self.assertRaises(ValueError):
+                RegexFSM(pattern, limits=ResourceLimits(max_nfa_states=state_count-1))
+
+        with self.assertRaises(ValueError):
+            RegexFSM("(((a{1000}){1000}){1000})", limits=ResourceLimits(max_nfa_states=10000))
+        with self.assertRaises(ValueError):
+            RegexSet(["a{6}", "b{6}"], limits=ResourceLimits(max_nfa_states=12))
+
+    def test_nesting_depth(self):
+        """Test deeply nested patterns are refused as syntax errors before recursive parsing"""
+        limits = ResourceLimits(max_nfa_states=50)
+        for pattern in ("(" * 500 + "a" + ")" * 500, "(a" * 400 + ")*" * 400, "a" + "*" * 3000, "(" * 5000):
+            with self.assertRaises(AttributeError):
+                RegexFSM(pattern)
+            with self.assertRaises(AttributeError):
+                RegexFSM(pattern, limits=limits)
+
+        depth = regex_module.MAX_NESTING_DEPTH
+        self.assertTrue(RegexFSM("(" * (depth-1) + "a" + ")" * (depth-1)).check_string("a"))
+        self.assertTrue(RegexFSM("(a" * (depth // 2 - 1) + ")*" * (depth // 2 - 1)).check_string("aaa"))
+
+    def test_dfa_limits(self):
+        """Test DFA cache is capped by state and memory limits"""
+        regex = RegexFSM("[a-c]*4.+hi", limits=ResourceLimits(max_dfa_states=16))
+        self.assertEqual(regex.dfa.max_states, 16)
+        regex = RegexFSM("[a-c]*4.+hi", limits=ResourceLimits(max_dfa_bytes=100 * regex_module.DFA_STATE_BYTES - 1))
+        self.assertEqual(regex.dfa.max_states, 99)
+        regex = RegexFSM("[a-c]*4.+hi", minimize=True, limits=ResourceLimits(max_dfa_bytes=100))
+        self.assertIsNone(regex.dfa)
+        self.assertIsNone(regex.dense_dfa)
+        self.assertTrue(regex.check_string("aaaaaa4uhi"))
+
+    def test_dfa_bytes_count_transitions(self):
+        """Test transitions by distinct characters are counted against DFA memory limit"""
+        string = "".join(chr(code) for code in range(0x4e00, 0x4e00 + 5000)) + "y"
+        regex = RegexFSM("[^x]*y", limits=ResourceLimits(max_dfa_bytes=64 * 1024))
+        self.assertTrue(regex.check_string(string))
+        self.assertIsNone(regex.dfa)
+
+        limits = ResourceLimits(max_dfa_bytes=256 * 1024)
+        regex = RegexFSM("[^x]*y", limits=limits)
+        self.assertTrue(regex.check_string(string[:1000] + "y"))
+        table = regex.dfa.table
+        self.assertEqual(sum(map(len, table.transitions)), 1001)
+        self.assertLessEqual(len(table.nfa_states) * regex_module.DFA_STATE_BYTES + table.transition_bytes,
+                             limits.max_dfa_bytes)
+
+    def test_dfa_bytes_with_strings_and_bytes(self):
+        """Test transitions by bytes are refused once strings used up DFA memory limit"""
+        limits = ResourceLimits(max_dfa_bytes=64 * 1024)
+        regex = RegexFSM("[^x]*a[^x]{4}", limits=limits)
+        self.assertFalse(regex.check_string("".join(chr(code) for code in range(0x4e00, 0x4e00 + 300))))
+        for seed in range(256):
+            data = bytes(b"ab"[(seed >> bit) & 1] for bit in range(8))
+            self.assertEqual(regex.check_bytes(data), re.fullmatch(b"[^x]*a[^x]{4}", data) is not None)
+            if regex.dfa is None:
+                break
+            table = regex.dfa.table
+            self.assertLessEqual(len(table.nfa_states) * regex_module.DFA_STATE_BYTES + table.transition_bytes,
+                                 limits.max_dfa_bytes)
+        self.assertIsNone(regex.dfa)
+        self.assertEqual(list(regex.match_many(["aaaaa", "xaaaa"])), [True, False])
+
+    def test_downgrade_to_nfa(self):
+        """Test full DFA cache is dropped for NFA simulation instead of being rebuilt"""
+        pattern = ".*a.{8}"
+        strings = ["".join(random_string) for random_string in
+                   (("ab"[(seed >> bit) & 1] for bit in range(12)) for seed in range(200))]
+        regex = RegexFSM(pattern, limits=ResourceLimits(max_dfa_states=32))
+        for string in strings:
+            self.assertEqual(regex.check_string(string), re.fullmatch(pattern, string) is not None)
+        self.assertIsNone(regex.dfa)
+
+        unlimited = RegexFSM(pattern, dfa_cache_size=32)
+        for string in strings:
+            unlimited.check_string(string)
+        self.assertGreater(unlimited.dfa.evictions, 0)
+
+    def test_input_length(self):
+        """Test longer inputs are refused by every entry point"""
+        regex = RegexFSM("a.*", limits=ResourceLimits(max_input_length=10))
+        self.assertTrue(regex.check_string("a" * 10))
+        for check in (regex.check_string, regex.search, regex.findall):
+            with self.assertRaises(ValueError):
+                check("a" * 11)
+        with self.assertRaises(ValueError):
+            regex.match_many(["a", "a" * 11])
+        with self.assertRaises(ValueError):
+            regex.check_bytes(b"a" * 11)
+        with self.assertRaises(ValueError):
+            regex.match_stream(["a" * 6, "a" * 6])
+        with self.assertRaises(ValueError):
+            regex.matcher().advance_bytes(memoryview(b"a" * 11))
+
+    def test_analysis(self):
+        """Test static bounds of active states and DFA states"""
+        report = RegexFSM("abc").analyze()
+        self.assertEqual((report.nfa_states, report.max_active_states), (4, 1))
+        self.assertFalse(report.exponential_dfa)
+
+        report = RegexFSM(".*a.{20}", limits=ResourceLimits(max_dfa_states=100)).analyze()
+        self.assertTrue(report.exponential_dfa)
+        self.assertGreater(report.dfa_states_bound, 2 ** 20)
+        # dot loop, a and 20 dots accept "a"
+        self.assertEqual(report.max_active_states, 22)
+        self.assertEqual(report.dfa_states_limit, 100)
+
+        for pattern in ("a*b+c.", "[a-c]*4.+hi", "(ab|a)*b"):
+            regex = RegexFSM(pattern, minimize=True)
+            report = regex.analyze()
+            self.assertLessEqual(regex.dense_dfa.state_count, report.dfa_states_bound)
+            lazy = RegexFSM(pattern)
+            for string in ("abbbcx", "aaaaaa4uhi", "ababab"):
+                matcher = lazy.matcher()
+                for char in string:
+                    self.assertLessEqual(matcher.advance(char).nfa_states().bit_count(), report.max_active_states)
+
+    def test_pickle_and_cache(self):
+        """Test limits survive pickling and are part of pattern cache key"""
+        limits = ResourceLimits(max_input_length=3)
+        regex = pickle.loads(pickle.dumps(RegexFSM("a+", limits=limits)))
+        self.assertEqual(regex.limits, limits)
+        regex_module.purge()
+        self.assertIsNot(regex_module.compile("a+", limits=limits), regex_module.compile("a+"))
+        self.assertIs(regex_module.compile("a+", limits=limits).limits, limits)
+
+
+class TestParser(unittest.TestCase):
+    def test_tokens(self):
+        """Test escapes, classes and counted repetitions are resolved by tokenizer"""
+        tokens = regex_module.tokenize("(?:a\\.|[^x-z]){2,}b{c")
+        self.assertEqual([token.kind for token in tokens],
+                         ["(", "char", "char", "|", "class", ")", "repeat", "char", "char", "char"])
+        self.assertEqual(tokens[2].value, ".")
+        self.assertEqual(tokens[4].value, (CharSet([(ord("x"), ord("z"))]), True))
+        self.assertEqual((tokens[6].value, tokens[6].position), ((2, None), 14))
+        with self.assertRaises(AttributeError):
+            regex_module.tokenize("a[bc")
+
+    def test_interned_nodes(self):
+        """Test equal subtrees of different patterns are the same hashable object"""
+        first = regex_module.parse("x(ab|c)+")
+        second = regex_module.parse("(ab|c)+y")
+        self.assertIs(first[1][1], second[1][0])
+        self.assertIs(regex_module.parse("x(ab|c)+"), first)
+        self.assertEqual({first: 1, second: 2}[regex_module.parse("(?:ab|c)+y")], 2)
+
+        regex_set = RegexSet(["x(ab|c)+", "(ab|c)+y"])
+        self.assertIs(regex_set.asts[0][1][1], regex_set.asts[1][1][0])
+        self.assertIs(RegexFSM("x(ab|c)+").ast, first)
+
+    def test_purge_drops_parsed_patterns(self):
+        """Test module purge clears parse cache and interned nodes"""
+        first = regex_module.parse("x(ab|c)+")
+        regex_module.purge()
+        self.assertEqual(regex_module.parse.cache_info().currsize, 0)
+        self.assertEqual(len(regex_module._interned_nodes), 0)
+        second = regex_module.parse("x(ab|c)+")
+        self.assertEqual(second, first)
+        self.assertIsNot(second, first)
+
+    def test_literal_runs(self):
+        """Test literals required by every matched string are found in the tree"""
+        runs = regex_module.literal_runs(regex_module.parse("ab(cd)+e[0-9]*(fg|fh)x{3}"))
+        self.assertIn("abcd", runs)
+        self.assertIn("cde", runs)
+        self.assertIn("xxx", runs)
+        self.assertIn("f", runs)
+        self.assertNotIn("fg", runs)
+
+    def test_required_literal_of_large_pattern(self):
+        """Test required literal is found in patterns with many states"""
+        regex = RegexFSM("[a-z]{300}.*needle.*[0-9]")
+        self.assertGreater(len(regex.states), 256)
+        self.assertEqual(regex.required_literal, "needle")
+        self.assertFalse(regex.check_string("a" * 300 + "noodle1"))
+        self.assertTrue(regex.check_string("a" * 300 + "needle1"))
+
+
 if __name__ == "__main__":
     unittest.main()
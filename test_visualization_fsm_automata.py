@@ -0,0 +1,73 @@
+"""Unit tests for export of FSM graphs"""
+import io
+import json
+import sys
+import unittest
+from regex import CharSet, RegexFSM, RegexSet
+from visualization_fsm_automata import (determinize, dfa_to_json, export_fsm, format_chars, iter_dfa_dot,
+                                        iter_nfa_dot, nfa_to_json)
+
+
+class TestExport(unittest.TestCase):
+    def test_graphviz_not_imported(self):
+        """Test exporting does not import graphviz"""
+        export_fsm(RegexFSM("ab*"), io.StringIO())
+        self.assertNotIn("graphviz", sys.modules)
+
+    def test_format_chars(self):
+        """Test labels of character sets"""
+        self.assertEqual(format_chars(CharSet.of("a")), "'a'")
+        self.assertEqual(format_chars(CharSet([(ord("a"), ord("z")), (ord("0"), ord("1"))])), "[01a-z]")
+        self.assertEqual(format_chars(CharSet([(0, ord("`")), (ord("b"), sys.maxunicode)])), "[^a]")
+        self.assertEqual(format_chars(CharSet([(0, sys.maxunicode)])), "any")
+        self.assertEqual(format_chars(CharSet([(0, 127)])), "any ascii")
+        self.assertEqual(format_chars(CharSet([(0x400, 0x4ff)])), "[\u0400-\u04ff]")
+        self.assertEqual(format_chars(CharSet([(0x2028, 0x202e)])), "[\\u2028-\\u202e]")
+        self.assertEqual(format_chars(CharSet.of("-]")), "[\\-\\]]")
+
+    def test_nfa_dot(self):
+        """Test DOT text of NFA with counts, accept states and epsilon transitions"""
+        lines = list(iter_nfa_dot(RegexFSM("a[0-9]*")))
+        self.assertEqual(lines[0], "digraph nfa {")
+        self.assertIn("  // 3 states, 3 edges", lines)
+        self.assertIn('  2 [label="2: CharClassState [0-9]", shape=doublecircle];', lines)
+        self.assertIn('  1 -> 2 [label="ε"];', lines)
+        self.assertIn('  2 -> 2 [label="[0-9]"];', lines)
+        self.assertEqual(lines[-1], "}")
+
+    def test_dfa_collapsed_edges(self):
+        """Test DFA edges to the same state are collapsed into one character class"""
+        regex = RegexFSM("[a-c]x|[d-f]x|y")
+        dfa = determinize(regex)
+        graph = dfa_to_json(dfa)
+        start_edges = [edge for edge in graph["edges"] if edge["from"] == dfa.start]
+        self.assertEqual(sorted(edge["label"] for edge in start_edges), ["'y'", "[a-f]"])
+        self.assertEqual(graph["edge_count"], len(graph["edges"]))
+        self.assertTrue(any(line.endswith('[label="[a-f]"];') for line in iter_dfa_dot(dfa)))
+
+    def test_json(self):
+        """Test JSON adjacency of NFA and DFA"""
+        output = io.StringIO()
+        export_fsm(RegexSet(["ab", "a+"]), output, "json")
+        graph = json.loads(output.getvalue())
+        self.assertEqual(graph["patterns"], ["ab", "a+"])
+        self.assertEqual(graph["state_count"], len(graph["states"]))
+        self.assertEqual(graph, nfa_to_json(RegexSet(["ab", "a+"])))
+
+        output = io.StringIO()
+        export_fsm(RegexFSM("ab+"), output, "json", "dfa")
+        self.assertEqual(json.loads(output.getvalue())["state_count"], 3)
+
+        with self.assertRaises(ValueError):
+            export_fsm(RegexFSM("(a|b)*a(a|b){8}"), io.StringIO(), automaton="dfa", max_states=16)
+
+    def test_large_automaton(self):
+        """Test thousands of states are exported line by line"""
+        regex = RegexFSM("[a-z]{0,2000}x", dfa_cache_size=0)
+        output = io.StringIO()
+        export_fsm(regex, output)
+        self.assertGreater(output.getvalue().count("\n"), 2 * len(regex.states))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,88 +1,265 @@
 """Visualization of Regex FSM"""
-import graphviz
-from regex import RegexFSM, State
+from __future__ import annotations
 
+import json
+from collections.abc import Iterator
+from typing import TextIO
 
-def visualize_regex_fsm(fsm: RegexFSM, output_file: str = "regex_fsm"):
+from regex import (ASCII_CHARS, DEAD_STATE, DEFAULT_DFA_CACHE_SIZE, UNICODE_CHARS, CharSet, DenseDFA, RegexFSM,
+                   RegexSet, State)
+
+# ranges longer than this are written as first-last
+MIN_RANGE_LENGTH = 3
+
+
+def _format_char(code: int) -> str:
+    """Formats one character of a label, special and unprintable ones escaped"""
+    char = chr(code)
+    if char in "[]^-\\":
+        return "\\" + char
+    if char.isprintable() and not char.isspace() or char == " ":
+        return char
+    if code < 256:
+        return f"\\x{code:02x}"
+    return f"\\u{code:04x}" if code < 0x10000 else f"\\U{code:08x}"
+
+
+def format_chars(chars: CharSet) -> str:
     """
-    Visualizes a RegexFSM as a directed graph.
-    
+    Formats a set of characters as a compact label.
+
     Args:
-        fsm: The compiled RegexFSM object
-        output_file: The filename to save the visualization (without extension)
+        chars: Characters accepted by a state or by a collapsed DFA edge
+
+    Returns:
+        'a' for one character, "any" for all characters, "any ascii" for all ascii characters,
+        otherwise a character class of ranges, negated when that is shorter
     """
-    # Create a directed graph with horizontal layout (left to right)
-    dot = graphviz.Digraph(comment='Regex FSM')
-    dot.attr(rankdir='LR')  # Set direction to Left-to-Right
-    
-    # Track visited states to avoid duplicates and infinite recursion
-    visited_states = set()
-    
-    def add_state_to_graph(state: State):
-        """Recursively add states and transitions to the graph"""
-        if state in visited_states:
-            return
-        visited_states.add(state)
-        
-        # Create label based on state type
-        state_class = state.__class__.__name__
-        
-        if state_class == "AsciiState":
-            label = f"{state._State__id}: {state_class} '{state.char}'"
-        elif state_class == "DotState":
-            label = f"{state._State__id}: {state_class} '.'"
-        elif state_class == "CharClassState":
-            if state.is_negated:
-                chars_str = "[^" + ''.join(sorted(state.chars)) + "]"
+    if chars == UNICODE_CHARS:
+        return "any"
+    if chars == ASCII_CHARS:
+        return "any ascii"
+    if len(chars.ranges) == 1 and chars.ranges[0][0] == chars.ranges[0][1]:
+        return repr(chr(chars.ranges[0][0]))
+
+    def format_ranges(char_set: CharSet) -> str:
+        parts = []
+        for first, last in char_set.ranges:
+            if last - first + 1 >= MIN_RANGE_LENGTH:
+                parts.append(f"{_format_char(first)}-{_format_char(last)}")
             else:
-                chars_str = "[" + ''.join(sorted(state.chars)) + "]"
-            label = f"{state._State__id}: {state_class} {chars_str}"
-        elif state_class == "StartState":
-            label = f"{state._State__id}: {state_class}"
-        else:
-            label = f"{state._State__id}: {state_class}"
-        
+                parts.extend(_format_char(code) for code in range(first, last + 1))
+        return "".join(parts)
+
+    label = "[" + format_ranges(chars) + "]"
+    negated = "[^" + format_ranges(UNICODE_CHARS - chars) + "]"
+    return negated if len(negated) < len(label) else label
+
+
+def _state_label(state: State) -> str:
+    """Creates label of a state based on its type"""
+    state_class = state.__class__.__name__
+    chars = state.accepted_chars()
+    if chars:
+        return f"{state.state_id}: {state_class} {format_chars(chars)}"
+    return f"{state.state_id}: {state_class}"
+
+
+def _quote(text: str) -> str:
+    """Quotes a DOT identifier or label"""
+    return json.dumps(text, ensure_ascii=False)
+
+
+def _nfa_edges(fsm: RegexFSM) -> Iterator[tuple[State, State, str | None]]:
+    """Yields transitions of the NFA with label of consumed characters, None for epsilon transitions"""
+    for state in fsm.states:
+        # a transition consumes characters accepted by the state it enters
+        for next_state in sorted(state.next_states, key=lambda next_state: next_state.state_id):
+            yield state, next_state, format_chars(next_state.accepted_chars())
+        for eps_state in sorted(state.epsilon_transition_states, key=lambda eps_state: eps_state.state_id):
+            yield state, eps_state, None
+
+
+def _dfa_edges(dfa: DenseDFA) -> Iterator[tuple[int, int, CharSet]]:
+    """Yields transitions of the DFA to live states, all classes leading to the same state collapsed"""
+    class_chars = dfa.class_chars()
+
+    for state in range(dfa.state_count):
+        if state == DEAD_STATE:
+            continue
+        targets: dict[int, list[tuple[int, int]]] = {}
+        for class_id in range(dfa.class_count):
+            next_state = dfa.transitions[state * dfa.class_count + class_id] // dfa.class_count
+            if next_state != DEAD_STATE:
+                targets.setdefault(next_state, []).extend(class_chars[class_id].ranges)
+        for next_state, ranges in sorted(targets.items()):
+            yield state, next_state, CharSet(ranges)
+
+
+def _patterns(fsm: RegexFSM) -> list[str]:
+    """Returns patterns compiled into the FSM"""
+    return list(fsm.patterns) if isinstance(fsm, RegexSet) else [fsm.pattern]
+
+
+def determinize(fsm: RegexFSM, max_states: int = DEFAULT_DFA_CACHE_SIZE) -> DenseDFA:
+    """
+    Returns minimized DFA of the FSM, built if the FSM does not keep one.
+
+    Args:
+        fsm: The compiled RegexFSM object
+        max_states: Maximal number of DFA states
+
+    Returns:
+        Minimized DFA
+
+    Raises:
+        ValueError: DFA would have more than max_states states
+    """
+    dfa = fsm.dense_dfa or DenseDFA.from_fsm(fsm, max_states)
+    if dfa is None:
+        raise ValueError(f"DFA of {_patterns(fsm)} has more than {max_states} states")
+    return dfa
+
+
+def iter_nfa_dot(fsm: RegexFSM) -> Iterator[str]:
+    """
+    Streams the NFA as lines of DOT text, without building the whole graph in memory.
+
+    Args:
+        fsm: The compiled RegexFSM object
+
+    Returns:
+        Iterator of lines without line ends
+    """
+    edge_count = sum(len(state.next_states) + len(state.epsilon_transition_states) for state in fsm.states)
+    yield "digraph nfa {"
+    yield "  rankdir=LR;"
+    yield f"  // {len(fsm.states)} states, {edge_count} edges"
+    for state in fsm.states:
         # Mark accept states with double circle
         shape = "doublecircle" if state.is_accept_state else "circle"
-        
-        # Add the state to the graph
-        dot.node(str(state._State__id), label, shape=shape)
-        
-        # Add normal transitions with appropriate labels
-        for next_state in state.next_states:
-            # Check class name instead of using isinstance
-            next_class = next_state.__class__.__name__
-            
-            if next_class == "AsciiState":
-                trans_label = f"'{next_state.char}'"
-            elif next_class == "DotState":
-                trans_label = "any ascii"
-            elif next_class == "CharClassState":
-                if next_state.is_negated:
-                    chars_display = "[^...]"
-                else:
-                    # Show actual characters if there aren't too many
-                    if len(next_state.chars) < 5:
-                        chars_display = f"[{''.join(sorted(next_state.chars))}]"
-                    else:
-                        chars_display = "[...]"
-                trans_label = chars_display
-            else:
-                trans_label = "transition"
-                
-            dot.edge(str(state._State__id), str(next_state._State__id), label=trans_label)
-            add_state_to_graph(next_state)
-        
-        # Add epsilon transitions (with ε label)
-        for eps_state in state.epsilon_transition_states:
-            dot.edge(str(state._State__id), str(eps_state._State__id), label="ε")
-            add_state_to_graph(eps_state)
-    
-    # Start from the start state
-    add_state_to_graph(fsm.start_state)
-    
+        yield f"  {state.state_id} [label={_quote(_state_label(state))}, shape={shape}];"
+    for state, next_state, label in _nfa_edges(fsm):
+        yield f"  {state.state_id} -> {next_state.state_id} [label={_quote('ε' if label is None else label)}];"
+    yield "}"
+
+
+def iter_dfa_dot(dfa: DenseDFA) -> Iterator[str]:
+    """
+    Streams the minimized DFA as lines of DOT text, edges to the dead state are left out.
+
+    Args:
+        dfa: Minimized DFA, e.g. from determinize()
+
+    Returns:
+        Iterator of lines without line ends
+    """
+    edges = list(_dfa_edges(dfa))
+    yield "digraph dfa {"
+    yield "  rankdir=LR;"
+    yield f"  // {dfa.state_count - 1} live states, {len(edges)} edges"
+    for state in range(dfa.state_count):
+        if state == DEAD_STATE:
+            continue
+        shape = "doublecircle" if dfa.accepting[state] else "circle"
+        label = f"{state}: start" if state == dfa.start else str(state)
+        yield f"  {state} [label={_quote(label)}, shape={shape}];"
+    for state, next_state, chars in edges:
+        yield f"  {state} -> {next_state} [label={_quote(format_chars(chars))}];"
+    yield "}"
+
+
+def nfa_to_json(fsm: RegexFSM) -> dict:
+    """
+    Describes the NFA as JSON serializable adjacency lists.
+
+    Args:
+        fsm: The compiled RegexFSM object
+
+    Returns:
+        Dictionary with state and edge counts, states and edges (label None is epsilon transition)
+    """
+    edges = [{"from": state.state_id, "to": next_state.state_id, "label": label}
+             for state, next_state, label in _nfa_edges(fsm)]
+    return {
+        "automaton": "nfa",
+        "patterns": _patterns(fsm),
+        "state_count": len(fsm.states),
+        "edge_count": len(edges),
+        "start": fsm.start_state.state_id,
+        "states": [{"id": state.state_id, "type": state.__class__.__name__,
+                    "chars": format_chars(state.accepted_chars()) if state.accepted_chars() else None,
+                    "accept": state.is_accept_state} for state in fsm.states],
+        "edges": edges,
+    }
+
+
+def dfa_to_json(dfa: DenseDFA) -> dict:
+    """
+    Describes the minimized DFA as JSON serializable adjacency lists.
+
+    Args:
+        dfa: Minimized DFA, e.g. from determinize()
+
+    Returns:
+        Dictionary with state and edge counts, states and collapsed edges
+    """
+    edges = [{"from": state, "to": next_state, "label": format_chars(chars),
+              "ranges": [list(char_range) for char_range in chars.ranges]}
+             for state, next_state, chars in _dfa_edges(dfa)]
+    return {
+        "automaton": "dfa",
+        "state_count": dfa.state_count - 1,
+        "edge_count": len(edges),
+        "start": dfa.start,
+        "states": [{"id": state, "accept": bool(dfa.accepting[state])}
+                   for state in range(dfa.state_count) if state != DEAD_STATE],
+        "edges": edges,
+    }
+
+
+def export_fsm(fsm: RegexFSM, file: TextIO, output_format: str = "dot", automaton: str = "nfa",
+               max_states: int = DEFAULT_DFA_CACHE_SIZE) -> None:
+    """
+    Writes the NFA or the minimized DFA of a RegexFSM as DOT text or JSON, without rendering.
+
+    Args:
+        fsm: The compiled RegexFSM object
+        file: Text file the graph is written to line by line
+        output_format: "dot" or "json"
+        automaton: "nfa" or "dfa"
+        max_states: Maximal number of DFA states
+    """
+    if automaton not in ("nfa", "dfa"):
+        raise ValueError(f"Unknown automaton '{automaton}'")
+    if output_format not in ("dot", "json"):
+        raise ValueError(f"Unknown format '{output_format}'")
+
+    if output_format == "json":
+        graph = nfa_to_json(fsm) if automaton == "nfa" else dfa_to_json(determinize(fsm, max_states))
+        json.dump(graph, file, ensure_ascii=False)
+        return
+
+    lines = iter_nfa_dot(fsm) if automaton == "nfa" else iter_dfa_dot(determinize(fsm, max_states))
+    for line in lines:
+        file.write(line + "\n")
+
+
+def visualize_regex_fsm(fsm: RegexFSM, output_file: str = "regex_fsm"):
+    """
+    Visualizes a RegexFSM as a directed graph rendered to PNG by graphviz.
+    graphviz is imported only here, exporting DOT or JSON does not need it.
+
+    Args:
+        fsm: The compiled RegexFSM object
+        output_file: The filename to save the visualization (without extension)
+    """
+    import graphviz
+
+    dot = graphviz.Source("\n".join(iter_nfa_dot(fsm)))
+
     # Render the graph
     dot.render(output_file, format='png', cleanup=True)
     print(f"FSM visualization saved to {output_file}.png")
-    
-    return dot
\ No newline at end of file
+
+    return dot